@@ -48,7 +48,9 @@ def login():
     # проверка существования пользователя и пароля
     if user and user.check_password(password):
         # Создание JWT токенов
-        access_token = create_access_token(identity=str(user.user_id), fresh=True)
+        # Роль кладем в токен, чтобы другие сервисы могли проверять права без запроса к auth_service
+        access_token = create_access_token(identity=str(user.user_id), fresh=True,
+                                           additional_claims={'role': user.role})
         refresh_token = create_refresh_token(identity=str(user.user_id))
         
         return jsonify({
@@ -65,8 +67,12 @@ def login():
 def refresh():
     # Получаем ID пользователя из Refresh Token
     current_user_id = get_jwt_identity()
+    user = User.query.get(int(current_user_id))
+    if not user:
+        return jsonify({"msg": "Пользователь не найден"}), 404
     # Создаем новый Access Token
-    new_access_token = create_access_token(identity=current_user_id, fresh=False)
+    new_access_token = create_access_token(identity=current_user_id, fresh=False,
+                                           additional_claims={'role': user.role})
     return jsonify({'access_token': new_access_token}), 200
 
 # Обновление профиля пользователя
@@ -1,4 +1,5 @@
 from rabbitmq_consumer import start_runner_consumer
+from run_consumer import start_run_consumer
 import time
 import logging
 
@@ -11,6 +12,9 @@ if __name__ == '__main__':
     # Даем время RabbitMQ и другим сервисам запуститься
     time.sleep(20)
     
+    # Запуски на своем вводе и примерах обрабатываются отдельно от проверки попыток
+    start_run_consumer()
+    
     # Бесконечный цикл для переподключения
     while True:
         try:
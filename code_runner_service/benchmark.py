@@ -0,0 +1,275 @@
+"""Бенчмарк песочницы и проверки попыток.
+
+Запускает синтетические программы на каждом языке через
+execute_code_in_sandbox_docker (компиляция + один запуск) и целые попытки
+через process_test_cases, и печатает перцентили задержки, тестов в секунду
+на ядро и разбивку времени на запуск процесса, компиляцию и выполнение.
+Результат можно сохранить в JSON (--output), чтобы сравнивать прогоны до и
+после оптимизаций раннера.
+
+БД и RabbitMQ не нужны: задача и тесты собираются в памяти, данные тестов
+кладутся во временное хранилище. Модули раннера импортируются в main()
+после настройки окружения: Config читает его при импорте.
+
+    python benchmark.py --iterations 30 --output before.json
+    python benchmark.py --languages cpp --workloads cpu tle --no-compile-cache
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import statistics
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+TIME_LIMIT_MS = 1000
+MEMORY_LIMIT_MB = 256
+
+# Синтетические программы: (язык, нагрузка) -> (код, вход)
+WORKLOADS = {
+    'python': {
+        'startup': ('pass', ''),
+        'trivial': ('a, b = map(int, input().split())\nprint(a + b)', '2 3'),
+        'cpu': ('s = 0\nfor i in range(3 * 10**6):\n    s += i * i\nprint(s)', ''),
+        'memory': ('data = [0] * (25 * 10**6)\nprint(len(data))', ''),
+        'large_output': ('import sys\nsys.stdout.write("1234567890\\n" * 10**6)', ''),
+        'tle': ('while True:\n    pass', ''),
+        'compile_error': ('def broken(:\n    pass', ''),
+    },
+    'cpp': {
+        'startup': ('int main() { return 0; }', ''),
+        'trivial': ('#include <iostream>\nint main() { long long a, b; std::cin >> a >> b; std::cout << a + b << std::endl; }', '2 3'),
+        'cpu': ('#include <cstdio>\nint main() { volatile unsigned long long s = 0; for (unsigned long long i = 0; i < 300000000ULL; ++i) s += i * i; printf("%llu\\n", (unsigned long long)s); }', ''),
+        'memory': ('#include <vector>\n#include <cstdio>\nint main() { std::vector<int> v(50000000, 1); printf("%zu\\n", v.size()); }', ''),
+        'large_output': ('#include <cstdio>\nint main() { for (int i = 0; i < 1000000; ++i) puts("1234567890"); }', ''),
+        'tle': ('int main() { volatile int x = 0; while (true) { ++x; } }', ''),
+        'compile_error': ('int main() { return undefined_name; }', ''),
+    },
+    'javascript': {
+        'startup': ('', ''),
+        'trivial': ('const [a, b] = require("fs").readFileSync(0, "utf8").trim().split(" ").map(Number);\nconsole.log(a + b);', '2 3'),
+        'cpu': ('let s = 0;\nfor (let i = 0; i < 3e8; i++) { s += i % 7; }\nconsole.log(s);', ''),
+        'memory': ('const a = new Array(25e6).fill(0);\nconsole.log(a.length);', ''),
+        'large_output': ('process.stdout.write("1234567890\\n".repeat(1e6));', ''),
+        'tle': ('while (true) {}', ''),
+        'compile_error': ('function broken( {', ''),
+    },
+}
+
+# Для прогона целых попыток: программы, проходящие тест "a b" -> "a+b"
+JUDGE_WORKLOADS = ('trivial',)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        'p50': pick(0.50),
+        'p90': pick(0.90),
+        'p99': pick(0.99),
+        'mean': round(statistics.fmean(ordered), 3),
+        'max': round(ordered[-1], 3)
+    }
+
+
+def configure_environment(bench_dir, no_compile_cache):
+    """Направить каталоги раннера в bench_dir (до импорта config)"""
+    # Рабочие каталоги бенчмарка не должны пересекаться с каталогами работающего раннера
+    os.environ.setdefault('RABBITMQ_PORT', '5672')
+    os.environ.setdefault('TEST_DATA_DIR', os.path.join(bench_dir, 'testdata'))
+    os.environ.setdefault('WORKSPACE_DIR', os.path.join(bench_dir, 'workspaces'))
+    os.environ.setdefault('COMPILE_CACHE_DIR', os.path.join(bench_dir, 'binaries'))
+    if no_compile_cache:
+        os.environ['COMPILE_CACHE_ENABLED'] = 'false'
+
+
+def bench_sandbox(language, workload, iterations):
+    """Компиляция + один запуск через execute_code_in_sandbox_docker"""
+    from code_sandbox import execute_code_in_sandbox_docker
+
+    code, input_data = WORKLOADS[language][workload]
+    latencies, compile_ms, run_wall_ms, cpu_ms, overhead_ms = [], [], [], [], []
+    statuses = Counter()
+
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = execute_code_in_sandbox_docker(code, input_data, TIME_LIMIT_MS, MEMORY_LIMIT_MB, language)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        statuses[result['status']] += 1
+        latencies.append(total_ms)
+        compile_ms.append(result.get('compile_time_ms', 0))
+        run_wall_ms.append(result.get('wall_time_ms', 0))
+        cpu_ms.append(result.get('execution_time_ms', 0))
+        # Все, что не компиляция и не сам запуск: рабочая директория, запись исходника
+        overhead_ms.append(max(total_ms - compile_ms[-1] - run_wall_ms[-1], 0))
+
+    return {
+        'language': language,
+        'workload': workload,
+        'iterations': iterations,
+        'statuses': dict(statuses),
+        'latency_ms': percentiles(latencies),
+        'phases_ms': {
+            'compile': round(statistics.fmean(compile_ms), 3),
+            'run_wall': round(statistics.fmean(run_wall_ms), 3),
+            'run_cpu': round(statistics.fmean(cpu_ms), 3),
+            # Время запуска процесса: астрономическое время минус процессорное время программы
+            'startup': round(max(statistics.fmean(run_wall_ms) - statistics.fmean(cpu_ms), 0), 3),
+            'overhead': round(statistics.fmean(overhead_ms), 3)
+        }
+    }
+
+
+def make_task(tests_per_submission):
+    """Задача в памяти: тесты "a b" -> "a+b" во временном хранилище"""
+    from task_cache import TaskSnapshot
+    from test_data_store import get_test_data_store
+
+    store = get_test_data_store()
+    test_cases = []
+    for i in range(tests_per_submission):
+        test_cases.append({
+            'test_case_id': i,
+            'input_digest': store.put_text(f'{i} {i * 7}\n'),
+            'expected_digest': store.put_text(f'{i * 8}\n'),
+            'is_example': False
+        })
+    task = SimpleNamespace(
+        task_id=0, time_limit_ms=TIME_LIMIT_MS, memory_limit_mb=MEMORY_LIMIT_MB,
+        checker_mode='exact', float_tolerance=None, test_set_version=1
+    )
+    return TaskSnapshot(task, test_cases)
+
+
+def bench_judge(language, workload, task, submissions, concurrency):
+    """Полная проверка попыток через process_test_cases"""
+    from rabbitmq_consumer import process_test_cases
+
+    code, _ = WORKLOADS[language][workload]
+    statuses = Counter()
+    latencies = []
+
+    def judge_one(i):
+        started = time.perf_counter()
+        verdict = process_test_cases(code, language, task, user_id=0, submission_id=f'bench-{i}')
+        return verdict, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for verdict, latency in executor.map(judge_one, range(submissions)):
+            statuses[verdict['status']] += 1
+            latencies.append(latency)
+    elapsed = time.perf_counter() - started
+
+    tests_run = submissions * len(task.test_cases)
+    tests_per_sec = tests_run / elapsed if elapsed else 0.0
+    return {
+        'language': language,
+        'workload': workload,
+        'submissions': submissions,
+        'tests_per_submission': len(task.test_cases),
+        'concurrency': concurrency,
+        'statuses': dict(statuses),
+        'elapsed_s': round(elapsed, 3),
+        'submission_latency_ms': percentiles(latencies),
+        'per_test_latency_ms': round(elapsed * 1000 * concurrency / tests_run, 3) if tests_run else 0.0,
+        'tests_per_sec': round(tests_per_sec, 2),
+        'tests_per_sec_per_core': round(tests_per_sec / (os.cpu_count() or 1), 2)
+    }
+
+
+def print_summary(report):
+    print(f"{'language':<11} {'workload':<14} {'statuses':<36} {'p50':>9} {'p99':>9} {'compile':>8} {'startup':>8} {'cpu':>8}")
+    for row in report['sandbox']:
+        statuses = ','.join(f'{k}:{v}' for k, v in row['statuses'].items())
+        phases = row['phases_ms']
+        print(f"{row['language']:<11} {row['workload']:<14} {statuses:<36} "
+              f"{row['latency_ms']['p50']:>9.1f} {row['latency_ms']['p99']:>9.1f} "
+              f"{phases['compile']:>8.1f} {phases['startup']:>8.1f} {phases['run_cpu']:>8.1f}")
+    print()
+    for row in report['judge']:
+        print(f"judge {row['language']:<11} {row['workload']:<10} {row['tests_per_sec']:>8.1f} tests/s "
+              f"({row['tests_per_sec_per_core']:.1f}/core), submission p50 {row['submission_latency_ms']['p50']:.1f}ms "
+              f"p99 {row['submission_latency_ms']['p99']:.1f}ms, statuses {dict(row['statuses'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Code runner benchmark')
+    parser.add_argument('--languages', nargs='+', default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument('--workloads', nargs='+', default=list(WORKLOADS['python']),
+                        choices=list(WORKLOADS['python']))
+    parser.add_argument('--iterations', type=int, default=20, help='runs per sandbox workload')
+    parser.add_argument('--submissions', type=int, default=20, help='submissions per judge workload')
+    parser.add_argument('--tests', type=int, default=20, help='tests per judged submission')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='submissions judged at once (default: RUNNER_CONCURRENCY)')
+    parser.add_argument('--skip-judge', action='store_true', help='only benchmark single sandbox runs')
+    parser.add_argument('--no-compile-cache', action='store_true', help='compile C++ on every run')
+    parser.add_argument('--output', help='write the machine-readable report to this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='runner-bench-') as bench_dir:
+        configure_environment(bench_dir, args.no_compile_cache)
+        run_benchmark(args)
+
+
+def run_benchmark(args):
+    from config import Config
+
+    if args.concurrency is None:
+        args.concurrency = Config.RUNNER_CONCURRENCY
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'host': socket.gethostname(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'time_limit_ms': TIME_LIMIT_MS,
+            'memory_limit_mb': MEMORY_LIMIT_MB,
+            'config': {
+                'compile_cache': Config.COMPILE_CACHE_ENABLED,
+                'python_zygote': Config.PYTHON_ZYGOTE_ENABLED,
+                'parallel_tests': Config.RUNNER_PARALLEL_TESTS,
+                'test_workers': Config.RUNNER_TEST_WORKERS,
+                'concurrency': args.concurrency
+            }
+        },
+        'sandbox': [],
+        'judge': []
+    }
+
+    for language in args.languages:
+        for workload in args.workloads:
+            print(f'sandbox: {language}/{workload}...', file=sys.stderr)
+            report['sandbox'].append(bench_sandbox(language, workload, args.iterations))
+
+    if not args.skip_judge:
+        task = make_task(args.tests)
+        for language in args.languages:
+            for workload in JUDGE_WORKLOADS:
+                print(f'judge: {language}/{workload}...', file=sys.stderr)
+                report['judge'].append(bench_judge(language, workload, task, args.submissions, args.concurrency))
+
+    print_summary(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Report written to {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
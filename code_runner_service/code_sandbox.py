@@ -1,157 +1,511 @@
 import subprocess
-import tempfile
 import os
+import shutil
+import tempfile
+import json
+import math
 import time
+import socket
 import logging
-import psutil
+import signal
+import selectors
+import threading
+from config import Config
+from compile_cache import get_compile_cache
+from workspace_pool import get_workspace_pool
 
 logger = logging.getLogger(__name__)
 
-def get_memory_usage(pid):
-    """Получить использование памяти процессом и его потомками в KB"""
+CPP_COMPILER = 'g++'
+CPP_COMPILE_FLAGS = ['-std=c++17', '-O2']
+
+# Как часто запущенный тест проверяет, не отменили ли его
+CANCEL_POLL_INTERVAL = 0.05
+
+# Fork-сервер, через который запускаются все решения (для Python - с прогретым интерпретатором)
+ZYGOTE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zygote_server.py')
+ZYGOTE_MESSAGE_SIZE = 64 * 1024
+ZYGOTE_START_TIMEOUT = 5
+# Сколько ждать закрытия вывода после того, как процесс убит
+KILL_GRACE_PERIOD = 1
+PIPE_CHUNK_SIZE = 64 * 1024
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+STDERR_LIMIT_BYTES = 64 * 1024
+# Если вывод проверяется чекером на лету, целиком он не хранится - только начало для отчета
+OUTPUT_PREVIEW_BYTES = 64 * 1024
+# Признаки того, что программа упала из-за невозможности выделить память
+OUT_OF_MEMORY_MARKERS = ('MemoryError', 'std::bad_alloc', 'out of memory')
+# Python игнорирует SIGXFSZ, и превышение RLIMIT_FSIZE видно только по ошибке записи
+FILE_SIZE_MARKERS = ('File too large',)
+
+def _compile_cpp(code_path, executable_path, artifact):
+    """Скомпилировать C++ исходник, ошибки компиляции записываются в артефакт"""
+    start_time = time.time()
+    compile_process = subprocess.run(
+        [CPP_COMPILER] + CPP_COMPILE_FLAGS + [code_path, '-o', executable_path],
+        capture_output=True,
+        text=True,
+        timeout=10,
+        encoding='utf-8'
+    )
+    artifact['compile_time_ms'] = int((time.time() - start_time) * 1000)
+    
+    if compile_process.returncode != 0:
+        artifact['status'] = 'COMPILATION_ERROR'
+        artifact['error'] = compile_process.stderr
+        return False
+    return True
+
+def prepare_code(code: str, work_dir: str, language: str = "python"):
+    """Подготовить код к запуску: записать исходник и при необходимости скомпилировать.
+
+    Возвращает артефакт (команду запуска и рабочую директорию), который
+    передается в run_prepared_code для каждого теста без повторной компиляции.
+    """
+    start_time = time.time()
+    artifact = {
+        'status': 'READY',
+        'language': language,
+        'work_dir': work_dir,
+        'command': [],
+        'error': '',
+        'code_path': '',
+        'compile_time_ms': 0,
+        'cache_hit': False,
+        # Компиляция не уложилась в лимит: исход зависит от загрузки машины
+        'compile_timed_out': False
+    }
+
     try:
-        process = psutil.Process(pid)
-        memory_info = process.memory_info()
-        # Получаем всех потомков
-        children = process.children(recursive=True)
-        
-        total_memory = memory_info.rss  # RSS в байтах
-        
-        for child in children:
-            try:
-                child_memory = child.memory_info()
-                total_memory += child_memory.rss
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-                
-        return total_memory / 1024  # Конвертируем в KB
-    except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
-        logger.warning(f"Could not get memory usage for pid {pid}: {e}")
+        if language == "python":
+            # Создаем Python файл
+            code_path = os.path.join(work_dir, "code.py")
+            with open(code_path, "w", encoding="utf-8") as f:
+                f.write(code)
+            
+            artifact['code_path'] = code_path
+            artifact['command'] = ['python', code_path]
+            
+        elif language == "cpp":
+            # Создаем C++ файл
+            code_path = os.path.join(work_dir, "code.cpp")
+            with open(code_path, "w", encoding="utf-8") as f:
+                f.write(code)
+            
+            artifact['code_path'] = code_path
+            executable_path = os.path.join(work_dir, 'a.out')
+            compile_cache = get_compile_cache()
+
+            if compile_cache is None:
+                if not _compile_cpp(code_path, executable_path, artifact):
+                    return artifact
+            else:
+                cache_key = compile_cache.make_key(code, CPP_COMPILER, CPP_COMPILE_FLAGS)
+                with compile_cache.key_lock(cache_key):
+                    artifact['cache_hit'] = compile_cache.fetch(cache_key, executable_path)
+                    if not artifact['cache_hit']:
+                        if not _compile_cpp(code_path, executable_path, artifact):
+                            return artifact
+                        compile_cache.store(cache_key, executable_path)
+                artifact['compile_time_ms'] = int((time.time() - start_time) * 1000)
+            
+            artifact['command'] = [executable_path]
+            
+        elif language == "javascript":
+            # Создаем JavaScript файл
+            code_path = os.path.join(work_dir, "code.js")
+            with open(code_path, "w", encoding="utf-8") as f:
+                f.write(code)
+            
+            artifact['code_path'] = code_path
+            artifact['command'] = ['node', code_path]
+            
+        else:
+            artifact['status'] = 'UNSUPPORTED_LANGUAGE'
+            artifact['error'] = f"Язык '{language}' не поддерживается"
+
+    except subprocess.TimeoutExpired:
+        artifact['status'] = 'COMPILATION_ERROR'
+        artifact['error'] = 'Compilation time limit exceeded'
+        artifact['compile_timed_out'] = True
+        artifact['compile_time_ms'] = int((time.time() - start_time) * 1000)
+    except Exception as e:
+        artifact['status'] = 'INTERNAL_ERROR'
+        artifact['error'] = str(e)
+        logger.error(f"Error preparing code: {e}")
+
+    return artifact
+
+class ZygoteError(Exception):
+    """Fork-сервер не ответил или завершился во время запуска"""
+    pass
+
+class Zygote:
+    """Один fork-сервер (zygote_server.py), обслуживающий по одному запуску за раз"""
+
+    def __init__(self):
+        self.sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        env = dict(os.environ, PYTHONIOENCODING='utf-8', PYTHONDONTWRITEBYTECODE='1')
+        self.process = subprocess.Popen(
+            ['python', ZYGOTE_SCRIPT, str(child_sock.fileno())],
+            pass_fds=[child_sock.fileno()],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            env=env
+        )
+        child_sock.close()
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def send_request(self, request, fds):
+        socket.send_fds(self.sock, [json.dumps(request).encode('utf-8')], fds)
+
+    def receive(self, timeout=None):
+        self.sock.settimeout(timeout)
+        try:
+            data = self.sock.recv(ZYGOTE_MESSAGE_SIZE)
+        except socket.timeout:
+            raise ZygoteError('Zygote did not respond in time')
+        finally:
+            self.sock.settimeout(None)
+        if not data:
+            raise ZygoteError('Zygote process exited')
+        return json.loads(data)
+
+    def close(self):
+        self.sock.close()
+        try:
+            self.process.kill()
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+class ZygotePool:
+    """Пул fork-серверов: берем свободный на время запуска теста и возвращаем"""
+
+    def __init__(self, max_idle):
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def warm_up(self, count):
+        """Заранее запустить fork-серверы, чтобы первые тесты не ждали старта"""
+        zygotes = [Zygote() for _ in range(count)]
+        for zygote in zygotes:
+            self.release(zygote)
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                zygote = self._idle.pop() if self._idle else None
+            if zygote is None:
+                return Zygote()
+            if zygote.is_alive():
+                return zygote
+            zygote.close()
+
+    def release(self, zygote, healthy=True):
+        if healthy and zygote.is_alive():
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(zygote)
+                    return
+        zygote.close()
+
+_zygote_pool = None
+_zygote_pool_lock = threading.Lock()
+
+def get_zygote_pool():
+    global _zygote_pool
+    with _zygote_pool_lock:
+        if _zygote_pool is None:
+            _zygote_pool = ZygotePool(max_idle=Config.ZYGOTE_POOL_SIZE)
+    return _zygote_pool
+
+def warm_up_zygotes():
+    """Прогреть пул fork-серверов при старте раннера"""
+    get_zygote_pool().warm_up(Config.ZYGOTE_POOL_SIZE)
+    logger.info(f"Started {Config.ZYGOTE_POOL_SIZE} fork servers")
+
+def _kill_child(pid):
+    """Убить потомка fork-сервера вместе с его группой процессов"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        # Потомок мог еще не успеть вызвать setsid
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+def _read_cpu_time_ms(pid):
+    """Процессорное время (user + system) работающего процесса по /proc/<pid>/stat"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+    except OSError:
         return 0
+    # Имя процесса в скобках может содержать пробелы, поля считаем после него
+    fields = stat[stat.rfind(b')') + 2:].split()
+    return (int(fields[11]) + int(fields[12])) * 1000 // CLOCK_TICKS
 
-def execute_code_in_sandbox_docker(code: str, input_data: str, time_limit_ms: int,
-                                   memory_limit_mb: int, language: str = "python"):
+def _drive_child(zygote, pid, input_bytes, stdin_w, stdout_r, stderr_r, deadline,
+                 cpu_limit_ms=None, output_limit_bytes=None, cancel_event=None, checker=None):
+    """Передать входные данные, собрать вывод и дождаться сообщения о завершении потомка.
+
+    Возвращает (stdout, stderr, exit_info, outcome), где outcome - 'exited',
+    'timeout' (потомок убит по дедлайну или лимиту процессорного времени),
+    'output_limit' (stdout превысил output_limit_bytes), 'wrong_answer'
+    (checker нашел расхождение с эталоном, потомок убит досрочно) или 'cancelled'.
+    Stderr сохраняется только в пределах STDERR_LIMIT_BYTES, stdout при
+    наличии checker - в пределах OUTPUT_PREVIEW_BYTES.
+    """
+    output = {stdout_r: [], stderr_r: []}
+    output_size = {stdout_r: 0, stderr_r: 0}
+    stored_limit = {stdout_r: output_limit_bytes, stderr_r: STDERR_LIMIT_BYTES}
+    if checker is not None:
+        stored_limit[stdout_r] = OUTPUT_PREVIEW_BYTES
+    exit_info = None
+    outcome = 'exited'
+    kill_time = None
+    input_view = memoryview(input_bytes)
+    input_offset = 0
+
+    selector = selectors.DefaultSelector()
+    try:
+        if stdin_w is None:
+            # Вход передан потомку файлом, писать нечего
+            pass
+        elif input_view:
+            os.set_blocking(stdin_w, False)
+            selector.register(stdin_w, selectors.EVENT_WRITE)
+        else:
+            os.close(stdin_w)
+        selector.register(stdout_r, selectors.EVENT_READ)
+        selector.register(stderr_r, selectors.EVENT_READ)
+        selector.register(zygote.sock, selectors.EVENT_READ)
+
+        while selector.get_map():
+            now = time.monotonic()
+            if exit_info is None and kill_time is None:
+                if cancel_event is not None and cancel_event.is_set():
+                    outcome = 'cancelled'
+                elif now >= deadline:
+                    outcome = 'timeout'
+                elif cpu_limit_ms is not None and _read_cpu_time_ms(pid) > cpu_limit_ms:
+                    outcome = 'timeout'
+                elif output_limit_bytes is not None and output_size[stdout_r] > output_limit_bytes:
+                    outcome = 'output_limit'
+                if outcome != 'exited':
+                    _kill_child(pid)
+                    kill_time = now
+            if kill_time is not None and now - kill_time > KILL_GRACE_PERIOD:
+                # Вывод держат открытым чужие процессы - дальше не ждем
+                break
+
+            for key, _ in selector.select(timeout=CANCEL_POLL_INTERVAL):
+                fd = key.fileobj
+                if fd is zygote.sock:
+                    data = zygote.sock.recv(ZYGOTE_MESSAGE_SIZE)
+                    if not data:
+                        raise ZygoteError('Zygote process exited during the run')
+                    exit_info = json.loads(data)
+                    selector.unregister(fd)
+                elif fd == stdin_w:
+                    try:
+                        input_offset += os.write(stdin_w, input_view[input_offset:input_offset + PIPE_CHUNK_SIZE])
+                    except BrokenPipeError:
+                        input_offset = len(input_view)
+                    if input_offset >= len(input_view):
+                        selector.unregister(stdin_w)
+                        os.close(stdin_w)
+                else:
+                    data = os.read(fd, PIPE_CHUNK_SIZE)
+                    if data:
+                        # Сверх лимита вывод не храним: процесс все равно будет убит
+                        limit = stored_limit[fd]
+                        if limit is None or output_size[fd] < limit:
+                            output[fd].append(data)
+                        output_size[fd] += len(data)
+                        if (fd == stdout_r and checker is not None and kill_time is None
+                                and not checker.feed(data)):
+                            # Ответ уже неверен - дальше программу не выполняем
+                            if exit_info is None:
+                                outcome = 'wrong_answer'
+                                _kill_child(pid)
+                                kill_time = time.monotonic()
+                    else:
+                        selector.unregister(fd)
+                        os.close(fd)
+    finally:
+        for key in list(selector.get_map().values()):
+            if key.fileobj is not zygote.sock:
+                os.close(key.fd)
+        selector.close()
+
+    if exit_info is None:
+        raise ZygoteError('Zygote did not report child exit')
+
+    return b''.join(output[stdout_r]), b''.join(output[stderr_r]), exit_info, outcome
+
+def run_prepared_code(artifact, input_data: str, time_limit_ms: int, memory_limit_mb: int,
+                      cancel_event=None, checker=None, input_fd=None):
+    """Запустить подготовленный артефакт на одном тесте.
+
+    Программа запускается напрямую потомком fork-сервера, без обверток
+    /usr/bin/time и timeout: процессорное время и пиковую память (RSS)
+    fork-сервер получает из wait4, а лимит времени раннер контролирует сам.
+    Вердикт по времени выносится по процессорному времени, а по астрономическому
+    стоит страховочный дедлайн (спящие и зависшие на вводе программы).
+
+    Если передан cancel_event (threading.Event), его установка
+    прерывает запуск: процесс убивается, а статус будет CANCELLED.
+
+    Если передан checker (см. output_checker), вывод сверяется с эталоном по
+    мере поступления: при первом расхождении процесс убивается и статус будет
+    WRONG_ANSWER, неверный ответ успешно завершившейся программы - тоже
+    WRONG_ANSWER. В output тогда попадает только начало вывода.
+
+    Вместо input_data можно передать input_fd - открытый на чтение файл с
+    входными данными: он становится stdin программы напрямую, данные не
+    проходят через раннер. Дескриптор закрывает вызывающий.
+
+    Каждый запуск получает свой пустой рабочий каталог внутри work_dir
+    артефакта и удаляет его после завершения: файлы, созданные программой
+    на одном тесте, не видны ей на следующем. Исходник и бинарник остаются
+    в work_dir и запускаются по абсолютному пути.
+    """
     start_time = time.time()
     result = {
         'status': 'UNKNOWN', 
         'output': '', 
         'error': '', 
         'execution_time_ms': 0,
+        'wall_time_ms': 0,
         'memory_used_kb': 0
     }
 
+    if artifact['status'] != 'READY':
+        result['status'] = artifact['status']
+        result['error'] = artifact['error']
+        return result
+
+    output_limit_bytes = Config.OUTPUT_LIMIT_MB * 1024 * 1024
+    run_dir = tempfile.mkdtemp(prefix='run-', dir=artifact['work_dir'])
+    request = {
+        'cwd': run_dir,
+        # Жесткий лимит процессорного времени: ядро само остановит зациклившуюся программу
+        'cpu_limit_s': math.ceil(time_limit_ms / 1000) + 1,
+        # Лимит памяти выставляется ядром (RLIMIT_DATA) и срабатывает во время работы,
+        # запас нужен на сам интерпретатор/рантайм
+        'memory_limit_bytes': (memory_limit_mb + Config.MEMORY_LIMIT_HEADROOM_MB) * 1024 * 1024,
+        # Ограничение на размер файлов, которые может записать программа
+        'output_limit_bytes': output_limit_bytes
+    }
+    if artifact['language'] == 'python' and Config.PYTHON_ZYGOTE_ENABLED:
+        # Python-код выполняется прямо в потомке прогретого интерпретатора
+        request.update({'mode': 'python', 'code_path': artifact['code_path']})
+    else:
+        request.update({'mode': 'exec', 'argv': artifact['command']})
+
+    pool = get_zygote_pool()
     try:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            base_command = []
-            memory_file = None
-            
-            if language == "python":
-                # Создаем Python файл
-                code_path = os.path.join(tmp_dir, "code.py")
-                with open(code_path, "w", encoding="utf-8") as f:
-                    f.write(code)
-                
-                base_command = ['python', code_path]
-                
-            elif language == "cpp":
-                # Создаем C++ файл
-                code_path = os.path.join(tmp_dir, "code.cpp")
-                with open(code_path, "w", encoding="utf-8") as f:
-                    f.write(code)
-                
-                executable_path = os.path.join(tmp_dir, 'a.out')
-                
-                # Компилируем
-                compile_process = subprocess.run(
-                    ['g++', '-std=c++17', '-O2', code_path, '-o', executable_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    encoding='utf-8'
-                )
-                
-                if compile_process.returncode != 0:
-                    result['status'] = 'COMPILATION_ERROR'
-                    result['error'] = compile_process.stderr
-                    return result
-                
-                base_command = [executable_path]
-                
-            elif language == "javascript":
-                # Создаем JavaScript файл
-                code_path = os.path.join(tmp_dir, "code.js")
-                with open(code_path, "w", encoding="utf-8") as f:
-                    f.write(code)
-                
-                base_command = ['node', code_path]
-                
-            else:
-                result['status'] = 'UNSUPPORTED_LANGUAGE'
-                result['error'] = f"Язык '{language}' не поддерживается"
-                return result
+        zygote = pool.acquire()
+    except Exception:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        raise
+    healthy = False
+    try:
+        if input_fd is not None:
+            stdin_r, stdin_w = input_fd, None
+        else:
+            stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            zygote.send_request(request, [stdin_r, stdout_w, stderr_w])
+        finally:
+            if stdin_w is not None:
+                os.close(stdin_r)
+            os.close(stdout_w)
+            os.close(stderr_w)
 
-            # Создаем файл для измерения памяти
-            memory_file = os.path.join(tmp_dir, 'memory_usage.txt')
-            
-            # Команда для выполнения с измерением памяти
-            full_command = [
-                '/usr/bin/time', '-v', '-o', memory_file,
-                'timeout', str(time_limit_ms/1000)
-            ] + base_command
-
-            # Выполняем код
-            process_start_time = time.time()
-            process = subprocess.run(
-                full_command,
-                input=input_data,
-                text=True,
-                capture_output=True,
-                timeout=(time_limit_ms/1000) + 2,
-                encoding='utf-8',
-                cwd=tmp_dir
-            )
-            
-            # Читаем использование памяти из файла
-            memory_used_kb = 0
-            if os.path.exists(memory_file):
-                with open(memory_file, 'r', encoding='utf-8') as f:
-                    memory_content = f.read()
-                    # Ищем строку с Maximum resident set size
-                    for line in memory_content.split('\n'):
-                        if 'Maximum resident set size (kbytes):' in line:
-                            try:
-                                memory_used_kb = int(line.split(':')[-1].strip())
-                                break
-                            except ValueError:
-                                logger.warning(f"Could not parse memory usage from: {line}")
-
-            # Обрабатываем результат
-            if process.returncode == 0:
-                result['status'] = 'SUCCESS'
-                result['output'] = process.stdout.strip()
-            elif process.returncode == 124:  # timeout
-                result['status'] = 'TIME_LIMIT_EXCEEDED'
-                result['error'] = 'Time limit exceeded'
-            else:
-                result['status'] = 'RUNTIME_ERROR'
-                result['error'] = process.stderr.strip()
+        try:
+            started = zygote.receive(timeout=ZYGOTE_START_TIMEOUT)
+        except ZygoteError:
+            for fd in (stdin_w, stdout_r, stderr_r):
+                if fd is not None:
+                    os.close(fd)
+            raise
 
-            result['execution_time_ms'] = int((time.time() - process_start_time) * 1000)
-            result['memory_used_kb'] = memory_used_kb
+        deadline = time.monotonic() + time_limit_ms / 1000 * Config.WALL_TIME_LIMIT_FACTOR
+        stdout, stderr, exit_info, outcome = _drive_child(
+            zygote, started['pid'], (input_data or '').encode('utf-8'),
+            stdin_w, stdout_r, stderr_r, deadline, time_limit_ms, output_limit_bytes, cancel_event,
+            checker
+        )
+        healthy = True
 
-            # Проверяем превышение лимита памяти
-            if memory_used_kb > memory_limit_mb * 1024:  # Конвертируем MB в KB
+        exit_code = exit_info['exit_code']
+        cpu_time_ms = exit_info['cpu_time_ms']
+        memory_used_kb = exit_info['max_rss_kb']
+        result['fork_to_result_ms'] = exit_info['fork_to_result_ms']
+        result['memory_used_kb'] = memory_used_kb
+        result['execution_time_ms'] = cpu_time_ms
+        result['wall_time_ms'] = int((time.time() - start_time) * 1000)
+
+        if outcome == 'cancelled':
+            result['status'] = 'CANCELLED'
+            result['error'] = 'Run cancelled'
+        elif outcome == 'output_limit' or exit_code == -signal.SIGXFSZ:
+            result['status'] = 'OUTPUT_LIMIT_EXCEEDED'
+            result['error'] = f'Output limit exceeded: more than {Config.OUTPUT_LIMIT_MB}MB'
+        elif outcome == 'timeout' or cpu_time_ms > time_limit_ms or exit_code == -signal.SIGXCPU:
+            result['status'] = 'TIME_LIMIT_EXCEEDED'
+            result['error'] = 'Time limit exceeded'
+        elif outcome == 'wrong_answer':
+            result['status'] = 'WRONG_ANSWER'
+            result['output'] = stdout.decode('utf-8', errors='replace').strip()
+        elif exit_code == 0:
+            result['status'] = 'SUCCESS'
+            result['output'] = stdout.decode('utf-8', errors='replace').strip()
+            if checker is not None and not checker.finish():
+                result['status'] = 'WRONG_ANSWER'
+        else:
+            result['status'] = 'RUNTIME_ERROR'
+            result['error'] = stderr.decode('utf-8', errors='replace').strip()
+            if exit_code < 0 and not result['error']:
+                result['error'] = f'Process killed by signal {signal.Signals(-exit_code).name}'
+            # Решение, упавшее на выделении памяти, уперлось в RLIMIT_DATA
+            if any(marker in result['error'] for marker in OUT_OF_MEMORY_MARKERS):
                 result['status'] = 'MEMORY_LIMIT_EXCEEDED'
-                result['error'] = f'Memory limit exceeded: {memory_used_kb/1024:.2f}MB > {memory_limit_mb}MB'
+                result['error'] = f'Memory limit exceeded: could not allocate more than {memory_limit_mb}MB'
+            elif any(marker in result['error'] for marker in FILE_SIZE_MARKERS):
+                result['status'] = 'OUTPUT_LIMIT_EXCEEDED'
+                result['error'] = f'Output limit exceeded: more than {Config.OUTPUT_LIMIT_MB}MB'
+
+        # Проверяем превышение лимита памяти
+        if result['status'] in ('SUCCESS', 'WRONG_ANSWER', 'RUNTIME_ERROR') and memory_used_kb > memory_limit_mb * 1024:  # Конвертируем MB в KB
+            result['status'] = 'MEMORY_LIMIT_EXCEEDED'
+            result['error'] = f'Memory limit exceeded: {memory_used_kb/1024:.2f}MB > {memory_limit_mb}MB'
 
-    except subprocess.TimeoutExpired:
-        result['status'] = 'TIME_LIMIT_EXCEEDED'
-        result['error'] = 'Time limit exceeded'
-        result['execution_time_ms'] = int((time.time() - start_time) * 1000)
     except Exception as e:
         result['status'] = 'INTERNAL_ERROR'
         result['error'] = str(e)
         logger.error(f"Error in code execution: {e}")
-        result['execution_time_ms'] = int((time.time() - start_time) * 1000)
+        result['wall_time_ms'] = int((time.time() - start_time) * 1000)
+    finally:
+        pool.release(zygote, healthy)
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    return result
 
-    return result
\ No newline at end of file
+def execute_code_in_sandbox_docker(code: str, input_data: str, time_limit_ms: int,
+                                   memory_limit_mb: int, language: str = "python"):
+    """Подготовить и выполнить код на одном тесте (компиляция + запуск)"""
+    with get_workspace_pool().workspace() as tmp_dir:
+        artifact = prepare_code(code, tmp_dir, language)
+        result = run_prepared_code(artifact, input_data, time_limit_ms, memory_limit_mb)
+        result['compile_time_ms'] = artifact['compile_time_ms']
+        return result
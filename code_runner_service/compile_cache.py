@@ -0,0 +1,187 @@
+import os
+import fcntl
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from functools import lru_cache
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_toolchain_version(compiler):
+    """Версия компилятора (входит в ключ кэша, чтобы обновление g++ не отдавало старые бинарники)"""
+    try:
+        version = subprocess.run(
+            [compiler, '-dumpfullversion', '-dumpversion'],
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+        machine = subprocess.run(
+            [compiler, '-dumpmachine'],
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+        return f'{compiler}-{version}-{machine}'
+    except Exception as e:
+        logger.warning(f"Could not detect {compiler} version: {e}")
+        return f'{compiler}-unknown'
+
+
+class CompileCache:
+    """Локальный кэш скомпилированных бинарников с адресацией по содержимому.
+
+    Ключ - sha256 от исходника, флагов компиляции и версии компилятора.
+    Размер кэша ограничен, при переполнении удаляются давно не использованные
+    бинарники (LRU по mtime, который обновляется при каждом попадании).
+    Каталог может быть общим для нескольких воркеров: запись идет через
+    временный файл + os.replace, а компиляция одного и того же ключа и
+    вытеснение защищены flock-блокировками. Блокировки ключей разбиты на
+    фиксированный набор файлов по первым символам ключа, поэтому каталог
+    блокировок не растет вместе с числом скомпилированных решений.
+    """
+
+    BINARY_SUFFIX = '.bin'
+    # 16^2 = 256 файлов блокировок на весь кэш
+    LOCK_PREFIX_LEN = 2
+
+    def __init__(self, cache_dir, max_size_bytes):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.locks_dir = os.path.join(cache_dir, 'locks')
+        os.makedirs(self.locks_dir, exist_ok=True)
+
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, source, compiler, flags):
+        digest = hashlib.sha256()
+        digest.update(get_toolchain_version(compiler).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(' '.join(flags).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(source.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _binary_path(self, key):
+        return os.path.join(self.cache_dir, key + self.BINARY_SUFFIX)
+
+    @contextmanager
+    def _flock(self, name):
+        with open(os.path.join(self.locks_dir, name), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def key_lock(self, key):
+        """Не даем двум воркерам одновременно компилировать один и тот же код.
+
+        Ключи с общим префиксом делят блокировку: изредка они компилируются
+        по очереди, зато файлов блокировок не больше 16^LOCK_PREFIX_LEN.
+        """
+        with self._flock(f'key-{key[:self.LOCK_PREFIX_LEN]}.lock'):
+            yield
+
+    def fetch(self, key, dest_path):
+        """Положить бинарник из кэша в dest_path. Возвращает True при попадании"""
+        binary_path = self._binary_path(key)
+        try:
+            try:
+                # Жесткая ссылка переживет вытеснение файла из кэша во время запуска
+                os.link(binary_path, dest_path)
+            except OSError as e:
+                if not os.path.exists(binary_path):
+                    raise FileNotFoundError(binary_path) from e
+                shutil.copy2(binary_path, dest_path)
+            os.utime(binary_path)
+        except FileNotFoundError:
+            with self._stats_lock:
+                self.misses += 1
+            return False
+
+        with self._stats_lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, binary_path):
+        """Сохранить свежескомпилированный бинарник в кэш"""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            os.close(fd)
+            shutil.copy2(binary_path, tmp_path)
+            os.replace(tmp_path, self._binary_path(key))
+        except OSError as e:
+            logger.warning(f"Could not store binary {key} in compile cache: {e}")
+            return
+        self._evict_if_needed()
+
+    def _evict_if_needed(self):
+        with self._flock('evict.lock'):
+            entries = []
+            total_size = 0
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(self.BINARY_SUFFIX):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_size += stat.st_size
+
+            if total_size <= self.max_size_bytes:
+                return
+
+            # Освобождаем с запасом, чтобы не сканировать каталог на каждой записи
+            target_size = self.max_size_bytes * 0.9
+            entries.sort()
+            evicted = 0
+            for _, size, path in entries:
+                if total_size <= target_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
+                evicted += 1
+
+        with self._stats_lock:
+            self.evictions += evicted
+        logger.info(f"Compile cache evicted {evicted} binaries, size now {total_size / 1024 / 1024:.1f}MB")
+
+    def get_stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+_cache = None
+_cache_init_lock = threading.Lock()
+
+def get_compile_cache():
+    """Общий на процесс экземпляр кэша (None, если кэш выключен в конфиге)"""
+    global _cache
+    if not Config.COMPILE_CACHE_ENABLED:
+        return None
+    with _cache_init_lock:
+        if _cache is None:
+            _cache = CompileCache(
+                cache_dir=Config.COMPILE_CACHE_DIR,
+                max_size_bytes=Config.COMPILE_CACHE_MAX_MB * 1024 * 1024
+            )
+    return _cache
@@ -19,5 +19,82 @@ class Config:
     # Имя очереди для прослушивания кода на исполнение
     RABBITMQ_QUEUE_CODE_RUNNER = 'code_submission_queue'
     
+    # Очередь запусков на своем вводе / примерах (без сохранения попытки)
+    RABBITMQ_QUEUE_CODE_RUN = 'code_run_queue'
+    # Сколько таких запусков выполняется одновременно (отдельно от RUNNER_CONCURRENCY)
+    RUNNER_RUN_WORKERS = int(os.environ.get('RUNNER_RUN_WORKERS', 2))
+    
+    # Максимальный приоритет сообщений в очереди попыток (x-max-priority)
+    RABBITMQ_QUEUE_MAX_PRIORITY = 10
+    
     # Имя очереди для результатов куда публикуем
-    RABBITMQ_QUEUE_RESULTS = 'code_results_queue'
\ No newline at end of file
+    RABBITMQ_QUEUE_RESULTS = 'code_results_queue'
+    
+    # Fanout exchange, через который main_service сообщает об изменении тестов задачи
+    RABBITMQ_EXCHANGE_TASK_UPDATES = 'task_updates'
+    
+    # Кэш задач и их тестов в памяти раннера. Записи сбрасываются по сообщениям
+    # из RABBITMQ_EXCHANGE_TASK_UPDATES, а на случай потерянного сообщения версия
+    # набора тестов сверяется с БД не чаще раза в TASK_CACHE_REVALIDATE_S секунд
+    TASK_CACHE_ENABLED = os.environ.get('TASK_CACHE_ENABLED', 'true').lower() == 'true'
+    TASK_CACHE_MAX_TASKS = int(os.environ.get('TASK_CACHE_MAX_TASKS', 1024))
+    TASK_CACHE_REVALIDATE_S = float(os.environ.get('TASK_CACHE_REVALIDATE_S', 60))
+    
+    # Кэш вердиктов в Postgres: повторная отправка того же кода на ту же версию
+    # тестов получает сохраненный результат без запуска
+    VERDICT_CACHE_ENABLED = os.environ.get('VERDICT_CACHE_ENABLED', 'true').lower() == 'true'
+    VERDICT_CACHE_TTL_S = int(os.environ.get('VERDICT_CACHE_TTL_S', 24 * 3600))
+    VERDICT_CACHE_CLEANUP_S = int(os.environ.get('VERDICT_CACHE_CLEANUP_S', 600))
+    
+    # Рабочие директории попыток (в контейнере - tmpfs), переиспользуются через пул
+    WORKSPACE_DIR = os.environ.get('WORKSPACE_DIR', '/run/code_runner/workspaces')
+    
+    # Локальное хранилище данных тестов (файлы по sha256, синхронизируются из БД)
+    TEST_DATA_DIR = os.environ.get('TEST_DATA_DIR', '/var/cache/code_runner/testdata')
+    
+    # Кэш скомпилированных бинарников (общий для воркеров на одном хосте)
+    COMPILE_CACHE_ENABLED = os.environ.get('COMPILE_CACHE_ENABLED', 'true').lower() == 'true'
+    COMPILE_CACHE_DIR = os.environ.get('COMPILE_CACHE_DIR', '/var/cache/code_runner/binaries')
+    COMPILE_CACHE_MAX_MB = int(os.environ.get('COMPILE_CACHE_MAX_MB', 512))
+    
+    # Параллельный запуск тестов одной попытки (пул общий на весь процесс)
+    RUNNER_PARALLEL_TESTS = os.environ.get('RUNNER_PARALLEL_TESTS', 'true').lower() == 'true'
+    RUNNER_TEST_WORKERS = int(os.environ.get('RUNNER_TEST_WORKERS', os.cpu_count() or 1))
+    
+    # Сколько попыток один контейнер проверяет одновременно
+    RUNNER_CONCURRENCY = int(os.environ.get('RUNNER_CONCURRENCY', os.cpu_count() or 1))
+    # Аренда попытки: раннер захватывает ее в БД (status = 'RUNNING') и, пока
+    # проверяет, продлевает аренду раз в RUNNER_CLAIM_SWEEP_S секунд. Если аренда
+    # не продлевалась RUNNER_CLAIM_LEASE_S секунд (раннер упал), попытка
+    # возвращается в очередь. Просроченные аренды ищутся с тем же интервалом
+    RUNNER_CLAIM_LEASE_S = int(os.environ.get('RUNNER_CLAIM_LEASE_S', 300))
+    RUNNER_CLAIM_SWEEP_S = int(os.environ.get('RUNNER_CLAIM_SWEEP_S', 30))
+    # prefetch в RabbitMQ = RUNNER_CONCURRENCY * RUNNER_PREFETCH_MULTIPLIER: из полученных
+    # сообщений воркеры выбирают попытки по очереди между пользователями
+    RUNNER_PREFETCH_MULTIPLIER = int(os.environ.get('RUNNER_PREFETCH_MULTIPLIER', 4))
+    # Вердикты пишутся в БД пакетами: раз в VERDICT_WRITE_INTERVAL_MS
+    # или сразу, как только набралось VERDICT_WRITE_MAX_ROWS попыток
+    VERDICT_WRITE_INTERVAL_MS = int(os.environ.get('VERDICT_WRITE_INTERVAL_MS', 20))
+    VERDICT_WRITE_MAX_ROWS = int(os.environ.get('VERDICT_WRITE_MAX_ROWS', 100))
+    
+    # Решения запускаются потомками fork-серверов (zygote_server.py).
+    # Для Python код выполняется прямо в потомке прогретого интерпретатора, без нового exec
+    PYTHON_ZYGOTE_ENABLED = os.environ.get('PYTHON_ZYGOTE_ENABLED', 'true').lower() == 'true'
+    ZYGOTE_POOL_SIZE = int(os.environ.get('ZYGOTE_POOL_SIZE', os.cpu_count() or 1))
+    
+    # Вердикт TLE выносится по процессорному времени; астрономическое время
+    # ограничено лимитом задачи, умноженным на этот коэффициент
+    WALL_TIME_LIMIT_FACTOR = float(os.environ.get('WALL_TIME_LIMIT_FACTOR', 2))
+    
+    # Лимиты, которые ядро применяет во время работы решения:
+    # память (лимит задачи + запас на рантайм) и объем вывода
+    MEMORY_LIMIT_HEADROOM_MB = int(os.environ.get('MEMORY_LIMIT_HEADROOM_MB', 16))
+    OUTPUT_LIMIT_MB = int(os.environ.get('OUTPUT_LIMIT_MB', 64))
+    
+    # Промежуточные события о ходе проверки (пройденные тесты) в очередь результатов,
+    # не чаще одного события на попытку за PROGRESS_MIN_INTERVAL_MS
+    PROGRESS_ENABLED = os.environ.get('PROGRESS_ENABLED', 'true').lower() == 'true'
+    PROGRESS_MIN_INTERVAL_MS = int(os.environ.get('PROGRESS_MIN_INTERVAL_MS', 250))
+    
+    # Метрики Prometheus (GET /metrics) на этом порту
+    METRICS_PORT = int(os.environ.get('METRICS_PORT', 5002))
@@ -0,0 +1,87 @@
+"""Метрики раннера в формате Prometheus (HTTP на Config.METRICS_PORT, /metrics).
+
+Время этапов проверки попытки: ожидание в очереди (от публикации в
+main_service до получения раннером), чтение из БД, компиляция, запуск
+каждого теста, сравнение вывода, запись вердикта и публикация результата.
+Плюс загрузка воркеров и статистика кэшей.
+"""
+import threading
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from config import Config
+
+# Границы корзин в секундах: от запуска тривиальной программы до ожидания в очереди
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# phase: queue_wait, db_fetch, compile, compare, db_write, publish
+PHASE_SECONDS = Histogram(
+    'runner_phase_seconds', 'Time spent in each judging phase',
+    ['phase', 'language'], buckets=LATENCY_BUCKETS
+)
+TEST_RUN_SECONDS = Histogram(
+    'runner_test_run_seconds', 'Wall time of a single test run',
+    ['language', 'status'], buckets=LATENCY_BUCKETS
+)
+JUDGE_SECONDS = Histogram(
+    'runner_judge_seconds', 'Total time to judge a submission (after it was taken from the queue)',
+    ['language', 'verdict'], buckets=LATENCY_BUCKETS
+)
+SUBMISSIONS_TOTAL = Counter(
+    'runner_submissions_total', 'Judged submissions',
+    ['language', 'verdict', 'from_cache']
+)
+
+WORKERS_TOTAL = Gauge('runner_judge_workers', 'Judge workers in the pool')
+WORKERS_BUSY = Gauge('runner_judge_workers_busy', 'Judge workers currently judging a submission')
+# Доля занятости: rate(runner_judge_busy_seconds_total) / runner_judge_workers
+WORKERS_BUSY_SECONDS = Counter('runner_judge_busy_seconds_total', 'Total time judge workers spent judging')
+LOCAL_QUEUE_SIZE = Gauge('runner_local_queue_size', 'Prefetched submissions waiting for a free worker')
+
+
+class CacheStatsCollector:
+    """Отдает статистику кэшей (их get_stats()) в момент запроса метрик"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = {}
+
+    def register(self, name, get_stats):
+        with self._lock:
+            self._sources[name] = get_stats
+
+    def collect(self):
+        hits = CounterMetricFamily('runner_cache_hits', 'Cache hits', labels=['cache'])
+        misses = CounterMetricFamily('runner_cache_misses', 'Cache misses', labels=['cache'])
+        hit_ratio = GaugeMetricFamily('runner_cache_hit_ratio', 'Cache hit ratio since start', labels=['cache'])
+        with self._lock:
+            sources = list(self._sources.items())
+        for name, get_stats in sources:
+            stats = get_stats()
+            hits.add_metric([name], stats['hits'])
+            misses.add_metric([name], stats['misses'])
+            hit_ratio.add_metric([name], stats['hit_rate'])
+        yield hits
+        yield misses
+        yield hit_ratio
+
+
+_cache_collector = CacheStatsCollector()
+REGISTRY.register(_cache_collector)
+
+def register_cache(name, get_stats):
+    """Добавить кэш в метрики (get_stats возвращает hits, misses и hit_rate)"""
+    _cache_collector.register(name, get_stats)
+
+def observe_phase(phase, language, seconds):
+    PHASE_SECONDS.labels(phase=phase, language=language).observe(max(seconds, 0))
+
+_server_started = False
+_server_lock = threading.Lock()
+
+def start_metrics_server():
+    """Поднять HTTP-сервер метрик (один раз на процесс)"""
+    global _server_started
+    with _server_lock:
+        if not _server_started:
+            start_http_server(Config.METRICS_PORT)
+            _server_started = True
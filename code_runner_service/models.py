@@ -12,6 +12,9 @@ class Task(db.Model):
     difficulty_level = db.Column(db.String(20), nullable=False) # 'EASY', 'MEDIUM', 'HARD'
     time_limit_ms = db.Column(db.Integer, nullable=False)
     memory_limit_mb = db.Column(db.Integer, nullable=False)
+    checker_mode = db.Column(db.String(20), nullable=False, default='exact') # 'exact', 'tokens', 'float'
+    float_tolerance = db.Column(db.Float, nullable=True)
+    test_set_version = db.Column(db.Integer, nullable=False, default=1)
     
     # Связь с тестовыми случаями
     test_cases = db.relationship('TaskTestCase', backref='task', lazy=True)
@@ -24,6 +27,9 @@ class TaskTestCase(db.Model):
     input_data = db.Column(db.Text, nullable=False)
     expected_output = db.Column(db.Text, nullable=False)
     is_example = db.Column(db.Boolean, nullable=False, default=False)
+    # sha256 данных (заполняет триггер в БД), по ним синхронизируется локальное хранилище тестов
+    input_sha256 = db.Column(db.String(64))
+    expected_sha256 = db.Column(db.String(64))
     
 # Модель для обновления статуса попытки
 class Submission(db.Model):
@@ -37,4 +43,15 @@ class Submission(db.Model):
     status = db.Column(db.String(50), nullable=True)
     run_time = db.Column(db.Integer, nullable=True) 
     memory_used = db.Column(db.Integer, nullable=True)
-    language = db.Column(db.String(50), nullable=True)
\ No newline at end of file
+    language = db.Column(db.String(50), nullable=True)
+    # Какой раннер и когда захватил попытку для проверки
+    claimed_by = db.Column(db.String(100), nullable=True)
+    claimed_at = db.Column(db.DateTime(timezone=True), nullable=True)
+# Модель кэша вердиктов для повторных отправок одного и того же кода
+class VerdictCacheEntry(db.Model):
+    __tablename__ = 'verdictcache'
+    cache_key = db.Column(db.String(64), primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.task_id'), nullable=False)
+    test_set_version = db.Column(db.Integer, nullable=False)
+    result = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.current_timestamp())
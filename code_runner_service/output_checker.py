@@ -0,0 +1,171 @@
+import re
+import math
+import time
+
+# Режимы сравнения вывода, настраиваются для каждой задачи (tasks.checker_mode)
+CHECKER_EXACT = 'exact'    # точное совпадение после strip() (поведение по умолчанию)
+CHECKER_TOKENS = 'tokens'  # сравнение по токенам, пробельные символы не важны
+CHECKER_FLOAT = 'float'    # как tokens, но числа сравниваются с допуском
+
+DEFAULT_FLOAT_TOLERANCE = 1e-6
+# Число может быть записано длиннее эталона (лишние знаки после запятой)
+FLOAT_TOKEN_SLACK = 64
+
+WHITESPACE = b' \t\n\r\x0b\x0c'
+TOKEN_RE = re.compile(rb'\S+')
+
+
+class ExactChecker:
+    """Потоковое сравнение вывода с эталоном, эквивалентное actual.strip() == expected.strip().
+
+    Вывод подается кусками через feed(); пробельные символы в конце куска
+    откладываются, пока не станет ясно, внутренние они или хвостовые.
+    Эталон может быть bytes или mmap - он не копируется целиком.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        start, end = 0, len(expected)
+        while start < end and expected[start] in WHITESPACE:
+            start += 1
+        while end > start and expected[end - 1] in WHITESPACE:
+            end -= 1
+        self.pos = start
+        self.end = end
+        self.pending = b''
+        self.started = False
+        self.ok = True
+
+    def feed(self, chunk):
+        """Проверить очередной кусок вывода. False - вывод уже точно неверный"""
+        if not self.ok:
+            return False
+        data = self.pending + chunk if self.pending else chunk
+        if not self.started:
+            data = data.lstrip(WHITESPACE)
+            if not data:
+                return True
+            self.started = True
+
+        core = data.rstrip(WHITESPACE)
+        self.pending = data[len(core):]
+        if core:
+            size = len(core)
+            if self.pos + size > self.end or self.expected[self.pos:self.pos + size] != core:
+                self.ok = False
+                return False
+            self.pos += size
+
+        # Хвост длиннее остатка эталона все равно не совпадет, если за ним будет текст
+        remaining = self.end - self.pos
+        if len(self.pending) > remaining + 1:
+            self.pending = self.pending[:remaining + 1]
+        return True
+
+    def finish(self):
+        """Вывод закончился: верен ли он целиком"""
+        return self.ok and self.pos == self.end
+
+
+class TokenChecker:
+    """Потоковое сравнение по токенам (последовательностям непробельных символов).
+
+    Если задан float_tolerance, токены, которые читаются как числа,
+    сравниваются с абсолютным/относительным допуском.
+    """
+
+    def __init__(self, expected, float_tolerance=None):
+        self._expected_tokens = (match.group() for match in TOKEN_RE.finditer(expected))
+        self._next_expected = None
+        self.float_tolerance = float_tolerance
+        self.tail = b''
+        self.ok = True
+
+    def _peek_expected(self):
+        if self._next_expected is None:
+            self._next_expected = next(self._expected_tokens, None)
+        return self._next_expected
+
+    def _match(self, actual):
+        expected = self._peek_expected()
+        self._next_expected = None
+        if expected is None:
+            return False
+        if actual == expected:
+            return True
+        if self.float_tolerance is None:
+            return False
+        try:
+            actual_value = float(actual)
+            expected_value = float(expected)
+        except ValueError:
+            return False
+        return math.isclose(actual_value, expected_value,
+                            rel_tol=self.float_tolerance, abs_tol=self.float_tolerance)
+
+    def feed(self, chunk):
+        """Проверить очередной кусок вывода. False - вывод уже точно неверный"""
+        if not self.ok:
+            return False
+        data = self.tail + chunk if self.tail else chunk
+        tokens = data.split()
+        # Последний токен может продолжиться в следующем куске
+        if tokens and not data[-1:].isspace():
+            self.tail = tokens.pop()
+        else:
+            self.tail = b''
+
+        for token in tokens:
+            if not self._match(token):
+                self.ok = False
+                return False
+
+        # Не копим бесконечный недописанный токен: он уже длиннее ожидаемого
+        if self.tail:
+            expected = self._peek_expected()
+            max_size = len(expected) if expected is not None else -1
+            if self.float_tolerance is not None and expected is not None:
+                max_size += FLOAT_TOKEN_SLACK
+            if len(self.tail) > max_size:
+                self.ok = False
+                return False
+        return True
+
+    def finish(self):
+        """Вывод закончился: верен ли он целиком"""
+        if not self.ok:
+            return False
+        if self.tail and not self._match(self.tail):
+            return False
+        return self._peek_expected() is None
+
+
+class TimedChecker:
+    """Обертка над чекером, суммирующая время, потраченное на сравнение вывода"""
+
+    def __init__(self, checker):
+        self.checker = checker
+        self.elapsed = 0.0
+
+    def feed(self, chunk):
+        start = time.perf_counter()
+        try:
+            return self.checker.feed(chunk)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    def finish(self):
+        start = time.perf_counter()
+        try:
+            return self.checker.finish()
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+
+def make_checker(expected, mode=CHECKER_EXACT, float_tolerance=None):
+    """Создать потоковый чекер для одного теста по настройкам задачи"""
+    if mode == CHECKER_TOKENS:
+        return TokenChecker(expected)
+    if mode == CHECKER_FLOAT:
+        return TokenChecker(expected, float_tolerance if float_tolerance is not None else DEFAULT_FLOAT_TOLERANCE)
+    return ExactChecker(expected)
@@ -0,0 +1,89 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """Промежуточные события о ходе проверки одной попытки.
+
+    События публикуются не чаще раза в min_interval секунд: первое событие
+    (тесты начали выполняться) уходит сразу, а тесты, завершившиеся в пределах
+    интервала, схлопываются в одно событие с последним состоянием, которое
+    отправляется по таймеру. После close() события больше не отправляются,
+    поэтому они не могут прийти позже итогового результата.
+    publish(event) должен быть потокобезопасным.
+    """
+
+    def __init__(self, publish, submission_id, user_id, task_id, total_tests, min_interval):
+        self._publish = publish
+        self._lock = threading.Lock()
+        self._timer = None
+        self._closed = False
+        self._last_sent = 0.0
+        self.min_interval = min_interval
+        self.state = {
+            'type': 'submission_progress',
+            'submission_id': submission_id,
+            'user_id': user_id,
+            'task_id': task_id,
+            'stage': 'testing',
+            'tests_done': 0,
+            'passed_tests': 0,
+            'total_tests': total_tests,
+            'last_test': None,
+            'last_status': None,
+            'last_time_ms': None
+        }
+
+    def started(self):
+        """Код подготовлен, тесты начинают выполняться"""
+        with self._lock:
+            self._send()
+
+    def test_done(self, index, result):
+        """Тест с номером index (с нуля) завершился"""
+        with self._lock:
+            if self._closed:
+                return
+            self.state['tests_done'] += 1
+            if result['passed']:
+                self.state['passed_tests'] += 1
+            self.state.update({
+                'last_test': index + 1,
+                'last_status': result['status'],
+                'last_time_ms': result.get('execution_time_ms', 0)
+            })
+            wait = self._last_sent + self.min_interval - time.monotonic()
+            if wait <= 0:
+                self._send()
+            elif self._timer is None:
+                self._timer = threading.Timer(wait, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            self._timer = None
+            self._send()
+
+    def _send(self):
+        if self._closed:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._last_sent = time.monotonic()
+        try:
+            self._publish(dict(self.state))
+        except Exception as e:
+            # Промежуточные события не критичны - итоговый результат все равно придет
+            logger.warning(f"Could not publish progress for submission {self.state['submission_id']}: {e}")
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
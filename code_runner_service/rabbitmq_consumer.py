@@ -1,11 +1,30 @@
+import os
+import zlib
+import base64
+import socket
 import pika
 import json
 import time
 import logging
+import threading
+import functools
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta, timezone
 from flask import Flask
 from config import Config
 from models import db, Task, TaskTestCase, Submission
-from code_sandbox import execute_code_in_sandbox_docker
+from code_sandbox import prepare_code, run_prepared_code, warm_up_zygotes, OUTPUT_PREVIEW_BYTES
+from output_checker import make_checker, TimedChecker
+from task_cache import TaskSnapshot, TaskCache, start_update_listener
+from test_data_store import get_test_data_store
+from verdict_cache import get_verdict_cache, make_verdict_key
+from scheduler import FairScheduler
+from workspace_pool import get_workspace_pool
+from compile_cache import get_compile_cache
+from progress import ProgressReporter
+from verdict_writer import VerdictWriter
+import metrics
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -14,176 +33,889 @@ app = Flask(__name__)
 app.config.from_object(Config)
 db.init_app(app)
 
-processing_submissions = {}
+# Кем раннер помечает захваченные попытки (submissions.claimed_by)
+RUNNER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+# Попытки, которые этот раннер сейчас проверяет: их аренду продлевает sweeper
+_active_claims = set()
+_active_claims_lock = threading.Lock()
+
+_test_executor = None
+_test_executor_lock = threading.Lock()
+
+_judge_executor = None
+_judge_executor_lock = threading.Lock()
+
+# Полученные, но еще не взятые воркерами попытки
+_scheduler = FairScheduler()
+
+_task_cache = None
+_task_cache_lock = threading.Lock()
+
+_verdict_writer = None
+_verdict_writer_lock = threading.Lock()
+
+# Исходники попыток, пришедших без кода в сообщении: submission_id, которые
+# ждут в локальной очереди, и уже прочитанные из БД одним запросом коды
+_code_wanted = set()
+_code_cache = {}
+_code_lock = threading.Lock()
+# Сколько исходников читать из БД за один запрос
+CODE_FETCH_BATCH = 32
+
+# Сколько раз перечитывать задачу, если ее тесты поменялись прямо во время загрузки
+TASK_LOAD_ATTEMPTS = 3
+# По сколько тестов за раз докачивать из БД в локальное хранилище
+TEST_DATA_SYNC_BATCH = 16
 
 def get_next_unsolved_task(current_task_id, user_id):
-    """Получить следующую нерешенную задачу"""
+    """Получить следующую нерешенную задачу (один запрос с NOT EXISTS)"""
     with app.app_context():
         try:
-            next_tasks = Task.query.filter(
-                Task.task_id > current_task_id
+            solved = db.session.query(Submission.submission_id).filter(
+                Submission.user_id == user_id,
+                Submission.task_id == Task.task_id,
+                Submission.is_complete.is_(True)
+            ).exists()
+            return db.session.query(Task.task_id).filter(
+                Task.task_id > current_task_id,
+                ~solved
             ).order_by(
                 Task.task_id.asc()
-            ).all()
-            
-            for task in next_tasks:
-                solved_submission = Submission.query.filter_by(
-                    user_id=user_id,
-                    task_id=task.task_id,
-                    is_complete=True
-                ).first()
-                
-                if not solved_submission:
-                    return task.task_id
-            
-            return None
+            ).limit(1).scalar()
         except Exception as e:
             logger.error(f"Error finding next task: {e}")
             return None
 
-def process_test_cases(code, language, task, user_id, submission_id):
-    """Обработать все тестовые случаи задачи"""
+def load_task_version(task_id):
+    """Текущая версия набора тестов задачи (None, если задачи нет)"""
     with app.app_context():
-        try:
-            test_cases = TaskTestCase.query.filter_by(task_id=task.task_id).all()
-            
-            if not test_cases:
-                logger.error(f"No test cases found for task {task.task_id}")
-                return {
-                    'status': 'INTERNAL_ERROR',
-                    'message': 'No test cases found',
-                    'passed_tests': 0,
-                    'total_tests': 0,
-                    'total_execution_time': 0,
-                    'max_memory_used_kb': 0
-                }
+        return db.session.query(Task.test_set_version).filter_by(task_id=task_id).scalar()
 
-            passed_tests = 0
-            failed_test = None
-            total_execution_time = 0
-            max_memory_used_kb = 0
-            
-            for i, test_case in enumerate(test_cases):
-                logger.info(f"Running test case {i+1}/{len(test_cases)} for submission {submission_id}")
-                
-                result = execute_code_in_sandbox_docker(
-                    code=code,
-                    input_data=test_case.input_data,
-                    time_limit_ms=task.time_limit_ms,
-                    memory_limit_mb=task.memory_limit_mb,
-                    language=language
-                )
-                
-                # Суммируем время выполнения всех тестов
-                total_execution_time += result.get('execution_time_ms', 0)
-                
-                # Обновляем максимальное использование памяти
-                current_memory = result.get('memory_used_kb', 0)
-                if current_memory > max_memory_used_kb:
-                    max_memory_used_kb = current_memory
-                
-                logger.info(f"Test case {i+1} result: {result['status']}, Memory: {current_memory}KB")
-                
-                # Проверяем статусы, связанные с памятью
-                if result['status'] == 'MEMORY_LIMIT_EXCEEDED':
-                    return {
-                        'status': result['status'],
-                        'message': f'Memory limit exceeded on test case {i+1}: {current_memory/1024:.2f}MB > {task.memory_limit_mb}MB',
-                        'passed_tests': passed_tests,
-                        'total_tests': len(test_cases),
-                        'total_execution_time': total_execution_time,
-                        'max_memory_used_kb': max_memory_used_kb,
-                        'failed_test_input': test_case.input_data,
-                        'expected_output': test_case.expected_output,
-                        'actual_output': result.get('output', '')
-                    }
-                
-                if result['status'] != 'SUCCESS':
-                    return {
-                        'status': result['status'],
-                        'message': f'Test case {i+1} failed: {result.get("error", "Unknown error")}',
-                        'passed_tests': passed_tests,
-                        'total_tests': len(test_cases),
-                        'total_execution_time': total_execution_time,
-                        'max_memory_used_kb': max_memory_used_kb,
-                        'failed_test_input': test_case.input_data,
-                        'expected_output': test_case.expected_output,
-                        'actual_output': result.get('output', '')
-                    }
-                
-                actual_output = result.get('output', '').strip()
-                expected_output = test_case.expected_output.strip()
-                
-                logger.info(f"Test case {i+1}: expected '{expected_output}', got '{actual_output}'")
-                
-                if actual_output == expected_output:
-                    passed_tests += 1
-                    logger.info(f"Test case {i+1} passed")
-                else:
-                    failed_test = {
-                        'test_case_number': i + 1,
-                        'input': test_case.input_data,
-                        'expected': expected_output,
-                        'actual': actual_output
-                    }
-                    logger.info(f"Test case {i+1} failed: expected '{expected_output}', got '{actual_output}'")
-                    break
-            
-            if passed_tests == len(test_cases):
-                return {
-                    'status': 'ACCEPTED',
-                    'message': 'All test cases passed',
-                    'passed_tests': passed_tests,
-                    'total_tests': len(test_cases),
-                    'total_execution_time': total_execution_time,
-                    'max_memory_used_kb': max_memory_used_kb
-                }
+def sync_test_data(task_id):
+    """Докачать в локальное хранилище недостающие тесты задачи.
+
+    Из БД сначала читаются только sha256 данных, а сами тексты - лишь для
+    тестов, которых еще нет на диске. Возвращает описания тестов по порядку.
+    """
+    store = get_test_data_store()
+    rows = db.session.query(
+        TaskTestCase.test_case_id, TaskTestCase.input_sha256, TaskTestCase.expected_sha256,
+        TaskTestCase.is_example
+    ).filter_by(task_id=task_id).order_by(TaskTestCase.test_case_id).all()
+
+    test_cases = [{
+        'test_case_id': row.test_case_id,
+        'input_digest': row.input_sha256,
+        'expected_digest': row.expected_sha256,
+        'is_example': row.is_example
+    } for row in rows]
+    missing = {
+        test_case['test_case_id']: test_case for test_case in test_cases
+        if not store.has(test_case['input_digest']) or not store.has(test_case['expected_digest'])
+    }
+
+    if missing:
+        query = db.session.query(
+            TaskTestCase.test_case_id, TaskTestCase.input_data, TaskTestCase.expected_output
+        ).filter(TaskTestCase.test_case_id.in_(list(missing))).yield_per(TEST_DATA_SYNC_BATCH)
+        for row in query:
+            test_case = missing[row.test_case_id]
+            test_case['input_digest'] = store.put_text(row.input_data)
+            test_case['expected_digest'] = store.put_text(row.expected_output)
+        logger.info(f"Synced {len(missing)} test cases of task {task_id} to local test data store")
+
+    return test_cases
+
+def load_task_snapshot(task_id):
+    """Загрузить задачу и ее тесты из БД в виде TaskSnapshot"""
+    with app.app_context():
+        for _ in range(TASK_LOAD_ATTEMPTS):
+            task = Task.query.get(task_id)
+            if not task:
+                return None
+            snapshot = TaskSnapshot(task, sync_test_data(task_id))
+            # Тесты читались отдельным запросом: убеждаемся, что версия за это время не сменилась
+            if load_task_version(task_id) == snapshot.test_set_version:
+                return snapshot
+            db.session.expire_all()
+        logger.warning(f"Test set of task {task_id} keeps changing, using the last loaded one")
+        return snapshot
+
+def decode_inline_code(task_data):
+    """Исходник из сообщения (None, если его туда не положили)"""
+    if 'code_zlib' in task_data:
+        return zlib.decompress(base64.b64decode(task_data['code_zlib'])).decode('utf-8')
+    # Сообщения старого формата с исходником как есть
+    return task_data.get('code')
+
+def want_code(submission_id):
+    """Попытка без исходника в сообщении попала в локальную очередь"""
+    with _code_lock:
+        _code_wanted.add(submission_id)
+
+def release_code(submission_id):
+    with _code_lock:
+        _code_wanted.discard(submission_id)
+        _code_cache.pop(submission_id, None)
+
+def get_submission_code(submission_id):
+    """Исходник попытки из БД.
+
+    При промахе одним запросом читаются и исходники других попыток, ждущих
+    в локальной очереди, чтобы воркеры, которые возьмут их следом, не ходили
+    в БД по одной.
+    """
+    with _code_lock:
+        code = _code_cache.pop(submission_id, None)
+        if code is not None:
+            return code
+        ids = [submission_id] + [i for i in _code_wanted if i != submission_id][:CODE_FETCH_BATCH - 1]
+        _code_wanted.difference_update(ids)
+
+    with app.app_context():
+        rows = db.session.query(Submission.submission_id, Submission.code).filter(
+            Submission.submission_id.in_(ids)
+        ).all()
+
+    code = None
+    with _code_lock:
+        for row in rows:
+            if row.submission_id == submission_id:
+                code = row.code
             else:
-                return {
-                    'status': 'WRONG_ANSWER',
-                    'message': f'Test case {failed_test["test_case_number"]} failed',
-                    'passed_tests': passed_tests,
-                    'total_tests': len(test_cases),
-                    'total_execution_time': total_execution_time,
-                    'max_memory_used_kb': max_memory_used_kb,
-                    'failed_test_input': failed_test['input'],
-                    'expected_output': failed_test['expected'],
-                    'actual_output': failed_test['actual']
-                }
-                
-        except Exception as e:
-            logger.error(f"Error processing test cases: {e}")
+                _code_cache[row.submission_id] = row.code
+    return code
+
+def get_task_cache():
+    """Общий на процесс кэш задач (None, если кэш выключен в конфиге)"""
+    global _task_cache
+    if not Config.TASK_CACHE_ENABLED:
+        return None
+    with _task_cache_lock:
+        if _task_cache is None:
+            _task_cache = TaskCache(
+                load_snapshot=load_task_snapshot,
+                load_version=load_task_version,
+                max_tasks=Config.TASK_CACHE_MAX_TASKS,
+                revalidate_after=Config.TASK_CACHE_REVALIDATE_S
+            )
+    return _task_cache
+
+def get_task(task_id):
+    """Задача с тестами: из кэша, а при промахе или выключенном кэше - из БД"""
+    cache = get_task_cache()
+    if cache is None:
+        return load_task_snapshot(task_id)
+    return cache.get(task_id)
+
+def get_test_executor():
+    """Общий пул для запуска тестов: ограничивает число одновременных запусков числом ядер"""
+    global _test_executor
+    with _test_executor_lock:
+        if _test_executor is None:
+            _test_executor = ThreadPoolExecutor(
+                max_workers=Config.RUNNER_TEST_WORKERS,
+                thread_name_prefix='test-runner'
+            )
+    return _test_executor
+
+def run_test_case(artifact, test_case, task, cancel_event=None):
+    """Запустить один тест, сверяя вывод с ожидаемым по мере его поступления.
+
+    Вход подается программе прямо из файла хранилища, эталон читается через mmap.
+    """
+    store = get_test_data_store()
+    expected = store.map(test_case['expected_digest'])
+    input_fd = store.open_fd(test_case['input_digest'])
+    try:
+        checker = TimedChecker(make_checker(expected, mode=task.checker_mode, float_tolerance=task.float_tolerance))
+        result = run_prepared_code(
+            artifact,
+            input_data=None,
+            time_limit_ms=task.time_limit_ms,
+            memory_limit_mb=task.memory_limit_mb,
+            cancel_event=cancel_event,
+            checker=checker,
+            input_fd=input_fd
+        )
+        language = artifact['language']
+        metrics.TEST_RUN_SECONDS.labels(language=language, status=result['status']).observe(result.get('wall_time_ms', 0) / 1000)
+        metrics.observe_phase('compare', language, checker.elapsed)
+        # Чекер держит ссылку на отображение, без этого его нельзя закрыть
+        del checker
+    finally:
+        os.close(input_fd)
+        if expected:
+            expected.close()
+    result['passed'] = result['status'] == 'SUCCESS'
+    return result
+
+def run_test_cases_sequential(artifact, test_cases, task, submission_id, progress=None):
+    """Запускать тесты по одному до первого упавшего"""
+    results = []
+    for i, test_case in enumerate(test_cases):
+        logger.info(f"Running test case {i+1}/{len(test_cases)} for submission {submission_id}")
+        result = run_test_case(artifact, test_case, task)
+        results.append(result)
+        if progress is not None:
+            progress.test_done(i, result)
+        if not result['passed']:
+            break
+    return results
+
+def run_test_cases_parallel(artifact, test_cases, task, submission_id, progress=None):
+    """Запускать тесты параллельно в общем пуле.
+
+    Как только тест i упал, тесты с большими номерами отменяются (а уже
+    запущенные убиваются), но тесты с меньшими номерами дорабатывают: они
+    тоже могут упасть, а в вердикт должен попасть тест с наименьшим номером.
+    Возвращает результаты тестов 1..N по порядку до первого упавшего
+    включительно - то же, что вернул бы последовательный прогон.
+
+    Одновременные запуски не делят рабочий каталог: run_prepared_code
+    создает каждому свой подкаталог, поэтому временные файлы решения на
+    разных тестах не перезаписывают друг друга.
+    """
+    executor = get_test_executor()
+    cancel_events = [threading.Event() for _ in test_cases]
+    futures = {}
+    for i, test_case in enumerate(test_cases):
+        future = executor.submit(run_test_case, artifact, test_case, task, cancel_events[i])
+        futures[future] = i
+    logger.info(f"Submitted {len(test_cases)} test cases for submission {submission_id} to parallel pool")
+
+    results = [None] * len(test_cases)
+    first_failed = len(test_cases)
+    pending = set(futures)
+
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                if future.cancelled():
+                    continue
+                result = future.result()
+                results[i] = result
+                if progress is not None and result['status'] != 'CANCELLED':
+                    progress.test_done(i, result)
+                if not result['passed'] and i < first_failed:
+                    first_failed = i
+                    logger.info(f"Test case {i+1} failed for submission {submission_id}, cancelling tests after it")
+                    for other, j in futures.items():
+                        if j > i:
+                            other.cancel()
+                            cancel_events[j].set()
+            # Ждем только тесты, которые еще могут повлиять на вердикт
+            pending = {f for f in pending if futures[f] < first_failed}
+    finally:
+        for event in cancel_events:
+            event.set()
+        # Отмененные запуски завершаются за CANCEL_POLL_INTERVAL, дожидаемся их,
+        # чтобы не удалить рабочую директорию из-под работающего процесса
+        wait(futures)
+
+    return results[:first_failed + 1]
+
+def build_verdict(results, test_cases, task, compile_time_ms):
+    """Собрать итоговый вердикт по результатам тестов (по порядку до первого упавшего)"""
+    passed_tests = 0
+    total_execution_time = 0
+    max_memory_used_kb = 0
+    # Время от fork до результата по данным fork-сервера
+    fork_to_result_ms = 0
+
+    for i, result in enumerate(results):
+        test_case = test_cases[i]
+
+        # Суммируем время выполнения всех тестов
+        total_execution_time += result.get('execution_time_ms', 0)
+        fork_to_result_ms += result.get('fork_to_result_ms', 0)
+        
+        # Обновляем максимальное использование памяти
+        current_memory = result.get('memory_used_kb', 0)
+        if current_memory > max_memory_used_kb:
+            max_memory_used_kb = current_memory
+        
+        logger.info(f"Test case {i+1} result: {result['status']}, Memory: {current_memory}KB")
+
+        if result['passed']:
+            passed_tests += 1
+            logger.info(f"Test case {i+1} passed")
+            continue
+
+        # Данные теста читаем из хранилища только для отчета о непройденном тесте
+        store = get_test_data_store()
+        verdict = {
+            'passed_tests': passed_tests,
+            'total_tests': len(test_cases),
+            'total_execution_time': total_execution_time,
+            'max_memory_used_kb': max_memory_used_kb,
+            'compile_time_ms': compile_time_ms,
+            'fork_to_result_ms': round(fork_to_result_ms, 3),
+            'failed_test_input': store.read_preview(test_case['input_digest'], OUTPUT_PREVIEW_BYTES),
+            'expected_output': store.read_preview(test_case['expected_digest'], OUTPUT_PREVIEW_BYTES),
+            'actual_output': result.get('output', '')
+        }
+        
+        # Проверяем статусы, связанные с памятью
+        if result['status'] == 'MEMORY_LIMIT_EXCEEDED':
+            verdict.update({
+                'status': result['status'],
+                'message': f'Memory limit exceeded on test case {i+1}: {current_memory/1024:.2f}MB > {task.memory_limit_mb}MB'
+            })
+            return verdict
+        
+        if result['status'] not in ('SUCCESS', 'WRONG_ANSWER'):
+            verdict.update({
+                'status': result['status'],
+                'message': f'Test case {i+1} failed: {result.get("error", "Unknown error")}'
+            })
+            return verdict
+        
+        actual_output = result.get('output', '').strip()
+        expected_output = verdict['expected_output'].strip()
+        logger.info(f"Test case {i+1} failed: expected '{expected_output[:200]}', got '{actual_output[:200]}'")
+        verdict.update({
+            'status': 'WRONG_ANSWER',
+            'message': f'Test case {i+1} failed',
+            'expected_output': expected_output,
+            'actual_output': actual_output
+        })
+        return verdict
+
+    return {
+        'status': 'ACCEPTED',
+        'message': 'All test cases passed',
+        'passed_tests': passed_tests,
+        'total_tests': len(test_cases),
+        'total_execution_time': total_execution_time,
+        'max_memory_used_kb': max_memory_used_kb,
+        'compile_time_ms': compile_time_ms,
+        'fork_to_result_ms': round(fork_to_result_ms, 3)
+    }
+
+def process_test_cases(code, language, task, user_id, submission_id, progress=None):
+    """Обработать все тестовые случаи задачи (task - TaskSnapshot).
+
+    progress (ProgressReporter) получает события по мере завершения тестов.
+    """
+    try:
+        test_cases = task.test_cases
+        
+        if not test_cases:
+            logger.error(f"No test cases found for task {task.task_id}")
             return {
                 'status': 'INTERNAL_ERROR',
-                'message': f'Error processing test cases: {str(e)}',
+                'message': 'No test cases found',
                 'passed_tests': 0,
                 'total_tests': 0,
                 'total_execution_time': 0,
-                'max_memory_used_kb': 0
+                'max_memory_used_kb': 0,
+                'compile_time_ms': 0
             }
 
-def update_submission_status(submission_id, status, is_complete, run_time=None, memory_used_kb=None):
-    """Обновить статус submission в БД"""
+        with get_workspace_pool().workspace() as work_dir:
+            # Компилируем код один раз на всю попытку, а не на каждый тест;
+            # каждый тест запускается в своем пустом подкаталоге work_dir
+            artifact = prepare_code(code, work_dir, language)
+            compile_time_ms = artifact['compile_time_ms']
+            metrics.observe_phase('compile', language, compile_time_ms / 1000)
+            logger.info(f"Prepared submission {submission_id}: {artifact['status']}, compile time: {compile_time_ms}ms, cache hit: {artifact['cache_hit']}")
+
+            if artifact['status'] != 'READY':
+                return {
+                    'status': artifact['status'],
+                    'message': f'Compilation failed: {artifact["error"]}',
+                    'passed_tests': 0,
+                    'total_tests': len(test_cases),
+                    'total_execution_time': 0,
+                    'max_memory_used_kb': 0,
+                    'compile_time_ms': compile_time_ms,
+                    'compile_timed_out': artifact['compile_timed_out']
+                }
+
+            if progress is not None:
+                progress.started()
+            if Config.RUNNER_PARALLEL_TESTS and len(test_cases) > 1:
+                results = run_test_cases_parallel(artifact, test_cases, task, submission_id, progress)
+            else:
+                results = run_test_cases_sequential(artifact, test_cases, task, submission_id, progress)
+
+        return build_verdict(results, test_cases, task, compile_time_ms)
+            
+    except Exception as e:
+        logger.error(f"Error processing test cases: {e}")
+        return {
+            'status': 'INTERNAL_ERROR',
+            'message': f'Error processing test cases: {str(e)}',
+            'passed_tests': 0,
+            'total_tests': 0,
+            'total_execution_time': 0,
+            'max_memory_used_kb': 0,
+            'compile_time_ms': 0
+        }
+
+def claim_submission(submission_id):
+    """Атомарно захватить попытку для проверки (общий для всех реплик раннера механизм).
+
+    Попытка переводится в RUNNING, только если она ждет проверки или если
+    аренда другого раннера истекла (он, скорее всего, упал). Возвращает True,
+    если попытку проверяет этот раннер.
+    """
     with app.app_context():
+        now = datetime.now(timezone.utc)
+        lease_border = now - timedelta(seconds=Config.RUNNER_CLAIM_LEASE_S)
         try:
-            submission = Submission.query.get(submission_id)
-            if submission:
-                submission.status = status
-                submission.is_complete = is_complete
-                if run_time is not None:
-                    submission.run_time = run_time
-                if memory_used_kb is not None:
-                    submission.memory_used = memory_used_kb  # Сохраняем в KB
-                db.session.commit()
-                logger.info(f"Updated submission {submission_id} status to {status}, memory: {memory_used_kb}KB")
-            else:
-                logger.error(f"Submission {submission_id} not found")
+            claimed = Submission.query.filter(
+                Submission.submission_id == submission_id,
+                db.or_(
+                    Submission.status == 'PENDING',
+                    db.and_(Submission.status == 'RUNNING', Submission.claimed_at < lease_border)
+                )
+            ).update({
+                'status': 'RUNNING',
+                'claimed_by': RUNNER_ID,
+                'claimed_at': now
+            }, synchronize_session=False)
+            db.session.commit()
+            return claimed == 1
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error claiming submission {submission_id}: {e}")
+            return False
+
+@contextmanager
+def renewed_claim(submission_id):
+    """Продлевать аренду попытки, пока выполняется блок"""
+    with _active_claims_lock:
+        _active_claims.add(submission_id)
+    try:
+        yield
+    finally:
+        with _active_claims_lock:
+            _active_claims.discard(submission_id)
+
+def renew_active_claims():
+    """Обновить claimed_at у всех попыток, которые этот раннер сейчас проверяет"""
+    with _active_claims_lock:
+        submission_ids = list(_active_claims)
+    if not submission_ids:
+        return
+    with app.app_context():
+        try:
+            Submission.query.filter(
+                Submission.submission_id.in_(submission_ids),
+                Submission.status == 'RUNNING',
+                Submission.claimed_by == RUNNER_ID
+            ).update({'claimed_at': datetime.now(timezone.utc)}, synchronize_session=False)
+            db.session.commit()
         except Exception as e:
-            logger.error(f"Error updating submission {submission_id}: {e}")
+            db.session.rollback()
+            logger.error(f"Error renewing claims of {len(submission_ids)} submissions: {e}")
+
+def write_verdicts(rows):
+    """Записать пакет вердиктов одним UPDATE ... FROM (VALUES ...) и одним коммитом.
+
+    Обновляются только попытки, которые все еще захвачены этим раннером.
+    Возвращает множество обновленных submission_id.
+    """
+    verdicts = db.values(
+        db.column('submission_id', db.BigInteger),
+        db.column('status', db.String),
+        db.column('is_complete', db.Boolean),
+        db.column('run_time', db.Integer),
+        db.column('memory_used', db.Integer),
+        name='verdicts'
+    ).data([
+        (row['submission_id'], row['status'], row['is_complete'], row['run_time'], row['memory_used'])
+        for row in rows
+    ])
+    with app.app_context():
+        try:
+            updated = db.session.execute(
+                db.update(Submission).where(
+                    Submission.submission_id == verdicts.c.submission_id,
+                    Submission.status == 'RUNNING',
+                    Submission.claimed_by == RUNNER_ID
+                ).values(
+                    status=verdicts.c.status,
+                    is_complete=verdicts.c.is_complete,
+                    # NULL в пакете - значение не меняется. Тип задаем явно: в колонке
+                    # VALUES из одних NULL Postgres иначе выведет text
+                    run_time=db.func.coalesce(db.cast(verdicts.c.run_time, db.Integer), Submission.run_time),
+                    memory_used=db.func.coalesce(db.cast(verdicts.c.memory_used, db.Integer), Submission.memory_used)
+                ).returning(Submission.submission_id)
+            ).scalars().all()
+            db.session.commit()
+            return set(updated)
+        except Exception:
+            db.session.rollback()
+            raise
+
+def get_verdict_writer():
+    """Общий на процесс писатель вердиктов"""
+    global _verdict_writer
+    with _verdict_writer_lock:
+        if _verdict_writer is None:
+            _verdict_writer = VerdictWriter(
+                write_batch=write_verdicts,
+                flush_interval=Config.VERDICT_WRITE_INTERVAL_MS / 1000,
+                max_rows=Config.VERDICT_WRITE_MAX_ROWS
+            )
+    return _verdict_writer
+
+def update_submission_status(submission_id, status, is_complete, run_time=None, memory_used_kb=None,
+                             language='python'):
+    """Поставить вердикт в очередь на запись, если попытка все еще захвачена этим раннером.
+
+    Возвращает Future, который после коммита пакета станет True, или False,
+    если аренду за это время перехватил другой раннер или запись не удалась.
+    """
+    start = time.perf_counter()
+    future = get_verdict_writer().submit({
+        'submission_id': submission_id,
+        'status': status,
+        'is_complete': is_complete,
+        'run_time': run_time,
+        'memory_used': memory_used_kb  # Сохраняем в KB
+    })
+
+    def on_written(f):
+        metrics.observe_phase('db_write', language, time.perf_counter() - start)
+        if f.result():
+            logger.info(f"Updated submission {submission_id} status to {status}, memory: {memory_used_kb}KB")
+        else:
+            logger.warning(f"Verdict for submission {submission_id} was not written (claim lost or DB error)")
+
+    future.add_done_callback(on_written)
+    return future
+
+def sweep_expired_claims():
+    """Вернуть в очередь попытки, чей раннер не уложился в аренду.
+
+    Попытка сначала атомарно переводится обратно в PENDING, поэтому при
+    нескольких репликах каждую из них переопубликует только один раннер.
+    """
+    with app.app_context():
+        lease_border = datetime.now(timezone.utc) - timedelta(seconds=Config.RUNNER_CLAIM_LEASE_S)
+        try:
+            rows = db.session.execute(
+                db.update(Submission).where(
+                    Submission.status == 'RUNNING',
+                    Submission.claimed_at < lease_border
+                ).values(
+                    status='PENDING', claimed_by=None, claimed_at=None
+                ).returning(
+                    Submission.submission_id, Submission.task_id, Submission.user_id,
+                    Submission.language
+                )
+            ).all()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error sweeping expired claims: {e}")
+            return
+    if not rows:
+        return
+
+    logger.warning(f"Requeueing {len(rows)} submissions with expired claims")
+    connection = pika.BlockingConnection(pika.ConnectionParameters(
+        host=Config.RABBITMQ_HOST,
+        port=Config.RABBITMQ_PORT
+    ))
+    try:
+        channel = connection.channel()
+        for row in rows:
+            channel.basic_publish(
+                exchange='',
+                routing_key=Config.RABBITMQ_QUEUE_CODE_RUNNER,
+                # Без исходника: раннер, взявший попытку, прочитает его из БД
+                body=json.dumps({
+                    'submission_id': row.submission_id,
+                    'task_id': row.task_id,
+                    'user_id': row.user_id,
+                    'language': row.language,
+                    'enqueued_at': time.time()
+                }),
+                properties=pika.BasicProperties(delivery_mode=2)
+            )
+    finally:
+        connection.close()
+
+def run_claim_sweeper():
+    while True:
+        time.sleep(Config.RUNNER_CLAIM_SWEEP_S)
+        try:
+            # Сначала продлеваем свои аренды, чтобы долгая проверка не ушла в очередь повторно
+            renew_active_claims()
+            sweep_expired_claims()
+        except Exception as e:
+            logger.error(f"Claim sweeper error: {e}")
+
+def start_claim_sweeper():
+    thread = threading.Thread(target=run_claim_sweeper, name='claim-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+def judge_submission(task_data, publish_progress=None):
+    """Полностью проверить одну попытку и вернуть результат для публикации.
+
+    Возвращает пару (результат, Future записи вердикта в БД): публиковать
+    результат можно только после того, как Future станет True. Результат
+    None, если попытку проверять не нужно (ее уже проверяет или проверил
+    другой раннер, либо задача не найдена). Выполняется в потоке
+    пула воркеров, с каналом RabbitMQ не работает: промежуточные события
+    отдаются в потокобезопасный publish_progress.
+    """
+    submission_id = task_data['submission_id']
+    task_id = task_data['task_id']
+    user_id = task_data['user_id']
+    language = task_data.get('language', 'python')
+    started = time.perf_counter()
+
+    enqueued_at = task_data.get('enqueued_at')
+    if enqueued_at is not None:
+        metrics.observe_phase('queue_wait', language, time.time() - enqueued_at)
+    
+    try:
+        if not claim_submission(submission_id):
+            logger.warning(f"Submission {submission_id} is already claimed or judged, skipping")
+            return None, None
+        
+        logger.info(f"Processing submission {submission_id} for task {task_id}")
+
+        code = decode_inline_code(task_data)
+        if code is None:
+            code = get_submission_code(submission_id)
+    finally:
+        release_code(submission_id)
+
+    # Пока идет проверка, sweeper продлевает аренду: иначе долгую попытку
+    # вернули бы в очередь, а вердикт этого раннера отклонили бы
+    with renewed_claim(submission_id):
+        if code is None:
+            logger.error(f"Code of submission {submission_id} not found")
+            update_submission_status(submission_id, 'INTERNAL_ERROR', False, language=language)
+            return None, None
+
+        fetch_start = time.perf_counter()
+        task = get_task(task_id)
+        metrics.observe_phase('db_fetch', language, time.perf_counter() - fetch_start)
+        if not task:
+            logger.error(f"Task {task_id} not found")
+            # Иначе попытка осталась бы в RUNNING и возвращалась в очередь по истечении аренды
+            update_submission_status(submission_id, 'INTERNAL_ERROR', False, language=language)
+            return None, None
+
+        test_result = None
+        verdict_cache = get_verdict_cache()
+        if verdict_cache is not None:
+            # Тот же код на той же версии тестов уже проверялся - не запускаем его снова
+            cache_key = make_verdict_key(task, language, code)
+            with app.app_context():
+                test_result = verdict_cache.get(cache_key)
+            if test_result is not None:
+                logger.info(f"Submission {submission_id}: verdict {test_result['status']} served from cache")
+
+        from_cache = test_result is not None
+        if not from_cache:
+            progress = None
+            if publish_progress is not None and Config.PROGRESS_ENABLED:
+                progress = ProgressReporter(
+                    publish_progress, submission_id, user_id, task_id,
+                    total_tests=len(task.test_cases),
+                    min_interval=Config.PROGRESS_MIN_INTERVAL_MS / 1000
+                )
+            try:
+                test_result = process_test_cases(code, language, task, user_id, submission_id, progress)
+            finally:
+                # Итоговый результат публикуется позже всех промежуточных событий
+                if progress is not None:
+                    progress.close()
+            if verdict_cache is not None:
+                with app.app_context():
+                    verdict_cache.store(cache_key, task, test_result)
+    
+        is_complete = (test_result['status'] == 'ACCEPTED')
+        final_status = test_result['status']
+    
+        # Обновляем статус submission в БД с реальным временем выполнения и памятью
+        # (запись идет пакетом вместе с вердиктами других воркеров)
+        written = update_submission_status(
+            submission_id=submission_id,
+            status=final_status,
+            is_complete=is_complete,
+            run_time=test_result.get('total_execution_time', 0),
+            memory_used_kb=test_result.get('max_memory_used_kb', 0),
+            language=language
+        )
+    
+        next_task_id = None
+        if is_complete:
+            next_task_id = get_next_unsolved_task(task_id, user_id)
+            logger.info(f"Task {task_id} completed, next task: {next_task_id}")
+
+        # Формируем результат С памятью
+        result_data = {
+            'submission_id': submission_id,
+            'user_id': user_id,
+            'task_id': task_id,
+            'status': final_status,
+            'is_complete': is_complete,
+            'run_time': test_result.get('total_execution_time', 0),
+            'compile_time_ms': test_result.get('compile_time_ms', 0),
+            'fork_to_result_ms': test_result.get('fork_to_result_ms', 0),
+            'memory_used_kb': test_result.get('max_memory_used_kb', 0),
+            'message': test_result['message'],
+            'passed_tests': test_result.get('passed_tests', 0),
+            'total_tests': test_result.get('total_tests', 0),
+            'next_task_id': next_task_id,
+            'from_cache': from_cache,
+            'language': language
+        }
+    
+        if final_status == 'WRONG_ANSWER':
+            result_data.update({
+                'failed_test_input': test_result.get('failed_test_input'),
+                'expected_output': test_result.get('expected_output'),
+                'actual_output': test_result.get('actual_output')
+            })
+
+        metrics.JUDGE_SECONDS.labels(language=language, verdict=final_status).observe(time.perf_counter() - started)
+        metrics.SUBMISSIONS_TOTAL.labels(language=language, verdict=final_status, from_cache=str(from_cache).lower()).inc()
+        return result_data, written
+
+def publish_result(channel, result_data):
+    """Опубликовать результат проверки. Вызывать только из потока соединения"""
+    start = time.perf_counter()
+    channel.basic_publish(
+        exchange='',
+        routing_key=Config.RABBITMQ_QUEUE_RESULTS,
+        body=json.dumps(result_data),
+        properties=pika.BasicProperties(
+            delivery_mode=2,
+            content_type='application/json'
+        )
+    )
+    metrics.observe_phase('publish', result_data.get('language', 'python'), time.perf_counter() - start)
+    logger.info(f"Result published for submission {result_data['submission_id']}. Status: {result_data['status']}, Compile: {result_data['compile_time_ms']}ms, Time: {result_data['run_time']}ms, Memory: {result_data['memory_used_kb']}KB")
+
+def publish_progress_event(channel, event):
+    """Опубликовать промежуточное событие. Вызывать только из потока соединения"""
+    if not channel.is_open:
+        return
+    channel.basic_publish(
+        exchange='',
+        routing_key=Config.RABBITMQ_QUEUE_RESULTS,
+        body=json.dumps(event),
+        # Событие теряет смысл после итогового результата, на диск его не сохраняем
+        properties=pika.BasicProperties(content_type='application/json')
+    )
+
+def handle_message(connection, channel, delivery_tag, body):
+    """Обработать сообщение в потоке пула воркеров.
+
+    pika.BlockingConnection не потокобезопасен, поэтому публикация результата
+    и ack/nack передаются в поток соединения через add_callback_threadsafe.
+    """
+    def on_done(result_data):
+        if result_data is not None:
+            publish_result(channel, result_data)
+            logger.info(f"Submission {result_data['submission_id']} processed successfully")
+        channel.basic_ack(delivery_tag=delivery_tag)
+
+    def on_error():
+        channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+
+    def publish_progress(event):
+        connection.add_callback_threadsafe(functools.partial(publish_progress_event, channel, event))
+
+    def schedule(callback):
+        try:
+            connection.add_callback_threadsafe(callback)
+        except Exception as e:
+            # Соединение уже закрыто: сообщение не подтверждено и будет доставлено повторно
+            logger.error(f"Could not schedule ack for delivery {delivery_tag}: {e}")
+
+    try:
+        result_data, written = judge_submission(json.loads(body), publish_progress)
+    except Exception as e:
+        logger.error(f"Error processing message: {e}")
+        schedule(on_error)
+        return
+
+    if written is None:
+        schedule(functools.partial(on_done, result_data))
+        return
+
+    def on_written(f):
+        # Результат публикуется только после коммита вердикта. Если вердикт не
+        # записан, попытку перехватил другой раннер (результат опубликует он)
+        # или БД недоступна (попытка вернется в очередь по истечении аренды)
+        schedule(functools.partial(on_done, result_data if f.result() else None))
+
+    written.add_done_callback(on_written)
+
+def judge_next():
+    """Взять из локальной очереди следующую по справедливости попытку и проверить ее"""
+    entry = _scheduler.get()
+    if entry is None:
+        return
+    user_id, (connection, channel, delivery_tag, body) = entry
+    metrics.WORKERS_BUSY.inc()
+    start = time.perf_counter()
+    try:
+        if not connection.is_open:
+            # Сообщение пришло по уже закрытому соединению - брокер доставит его повторно,
+            # а исходник, который для него держали в памяти, больше не нужен
+            try:
+                release_code(json.loads(body)['submission_id'])
+            except (ValueError, TypeError, KeyError):
+                pass
+            return
+        handle_message(connection, channel, delivery_tag, body)
+    finally:
+        metrics.WORKERS_BUSY_SECONDS.inc(time.perf_counter() - start)
+        metrics.WORKERS_BUSY.dec()
+        _scheduler.done(user_id)
+
+def get_judge_executor():
+    """Пул воркеров, одновременно проверяющих попытки (переживает переподключения)"""
+    global _judge_executor
+    with _judge_executor_lock:
+        if _judge_executor is None:
+            _judge_executor = ThreadPoolExecutor(
+                max_workers=Config.RUNNER_CONCURRENCY,
+                thread_name_prefix='judge'
+            )
+    return _judge_executor
+
+def start_metrics():
+    """Зарегистрировать метрики пула воркеров и кэшей и поднять HTTP-сервер метрик"""
+    metrics.WORKERS_TOTAL.set(Config.RUNNER_CONCURRENCY)
+    metrics.LOCAL_QUEUE_SIZE.set_function(lambda: len(_scheduler))
+    for name, cache in (('compile', get_compile_cache()), ('task', get_task_cache()),
+                        ('verdict', get_verdict_cache())):
+        if cache is not None:
+            metrics.register_cache(name, cache.get_stats)
+    try:
+        metrics.start_metrics_server()
+        logger.info(f"Metrics are served on port {Config.METRICS_PORT}")
+    except OSError as e:
+        logger.error(f"Could not start metrics server: {e}")
 
 def start_runner_consumer():
-    """Запуск потребителя с полной проверкой тестов"""
-    logger.info("Starting Code Runner Service Consumer with full test validation")
+    """Запуск потребителя с полной проверкой тестов в пуле воркеров"""
+    logger.info(f"Starting Code Runner Service Consumer with {Config.RUNNER_CONCURRENCY} concurrent judges")
+    executor = get_judge_executor()
+    warm_up_zygotes()
+    task_cache = get_task_cache()
+    if task_cache is not None:
+        start_update_listener(task_cache)
+    start_claim_sweeper()
+    start_metrics()
     
     while True:
         try:
@@ -191,110 +923,35 @@ def start_runner_consumer():
                 pika.ConnectionParameters(
                     host=Config.RABBITMQ_HOST,
                     port=Config.RABBITMQ_PORT,
-                    heartbeat=600,
+                    heartbeat=60,
                     blocked_connection_timeout=300
                 )
             )
             
             channel = connection.channel()
             
-            channel.queue_declare(queue=Config.RABBITMQ_QUEUE_CODE_RUNNER, durable=True)
+            # Очередь с приоритетами: приоритет выставляет main_service при публикации
+            channel.queue_declare(
+                queue=Config.RABBITMQ_QUEUE_CODE_RUNNER,
+                durable=True,
+                arguments={'x-max-priority': Config.RABBITMQ_QUEUE_MAX_PRIORITY}
+            )
             channel.queue_declare(queue=Config.RABBITMQ_QUEUE_RESULTS, durable=True)
             
-            channel.basic_qos(prefetch_count=1)
+            # Берем сообщений с запасом, чтобы было из кого выбирать при честном распределении
+            channel.basic_qos(prefetch_count=Config.RUNNER_CONCURRENCY * Config.RUNNER_PREFETCH_MULTIPLIER)
             
             def callback(ch, method, properties, body):
-                """Callback для обработки сообщений с полной проверкой тестов"""
+                """Кладем сообщение в локальную очередь, поток соединения остается свободным для heartbeat"""
                 try:
-                    task_data = json.loads(body)
-                    submission_id = task_data['submission_id']
-                    task_id = task_data['task_id']
-                    user_id = task_data['user_id']
-                    code = task_data['code']
-                    language = task_data.get('language', 'python')
-                    
-                    if submission_id in processing_submissions:
-                        logger.warning(f"Submission {submission_id} is already being processed, skipping")
-                        ch.basic_ack(delivery_tag=method.delivery_tag)
-                        return
-                    
-                    processing_submissions[submission_id] = True
-                    
-                    logger.info(f"Processing submission {submission_id} for task {task_id}")
-            
-                    with app.app_context():
-                        task = Task.query.get(task_id)
-                        if not task:
-                            logger.error(f"Task {task_id} not found")
-                            del processing_submissions[submission_id]
-                            ch.basic_ack(delivery_tag=method.delivery_tag)
-                            return
-            
-                    test_result = process_test_cases(code, language, task, user_id, submission_id)
-                    
-                    is_complete = (test_result['status'] == 'ACCEPTED')
-                    final_status = test_result['status']
-                    
-                    # Обновляем статус submission в БД с реальным временем выполнения и памятью
-                    update_submission_status(
-                        submission_id=submission_id,
-                        status=final_status,
-                        is_complete=is_complete,
-                        run_time=test_result.get('total_execution_time', 0),
-                        memory_used_kb=test_result.get('max_memory_used_kb', 0)
-                    )
-                    
-                    next_task_id = None
-                    if is_complete:
-                        next_task_id = get_next_unsolved_task(task_id, user_id)
-                        logger.info(f"Task {task_id} completed, next task: {next_task_id}")
-            
-                    # Формируем результат С памятью
-                    result_data = {
-                        'submission_id': submission_id,
-                        'user_id': user_id,
-                        'task_id': task_id,
-                        'status': final_status,
-                        'is_complete': is_complete,
-                        'run_time': test_result.get('total_execution_time', 0),
-                        'memory_used_kb': test_result.get('max_memory_used_kb', 0),
-                        'message': test_result['message'],
-                        'passed_tests': test_result.get('passed_tests', 0),
-                        'total_tests': test_result.get('total_tests', 0),
-                        'next_task_id': next_task_id
-                    }
-                    
-                    if final_status == 'WRONG_ANSWER':
-                        result_data.update({
-                            'failed_test_input': test_result.get('failed_test_input'),
-                            'expected_output': test_result.get('expected_output'),
-                            'actual_output': test_result.get('actual_output')
-                        })
-                    
-                    channel.basic_publish(
-                        exchange='',
-                        routing_key=Config.RABBITMQ_QUEUE_RESULTS,
-                        body=json.dumps(result_data),
-                        properties=pika.BasicProperties(
-                            delivery_mode=2,
-                            content_type='application/json'
-                        )
-                    )
-                    
-                    logger.info(f"Result published for submission {submission_id}. Status: {final_status}, Time: {result_data['run_time']}ms, Memory: {result_data['memory_used_kb']}KB")
-                    
-                    if submission_id in processing_submissions:
-                        del processing_submissions[submission_id]
-                    
-                    ch.basic_ack(delivery_tag=method.delivery_tag)
-                    logger.info(f"Submission {submission_id} processed successfully")
-                        
-                except Exception as e:
-                    logger.error(f"Error processing message: {e}")
-                    submission_id = json.loads(body).get('submission_id')
-                    if submission_id in processing_submissions:
-                        del processing_submissions[submission_id]
-                    ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                    message = json.loads(body)
+                    user_id = message.get('user_id')
+                    if 'code_zlib' not in message and 'code' not in message:
+                        want_code(message['submission_id'])
+                except (ValueError, AttributeError, KeyError):
+                    user_id = None
+                _scheduler.put(user_id, properties.priority, (connection, ch, method.delivery_tag, body))
+                executor.submit(judge_next)
                         
             channel.basic_consume(
                 queue=Config.RABBITMQ_QUEUE_CODE_RUNNER,
@@ -0,0 +1,174 @@
+import pika
+import json
+import time
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from code_sandbox import prepare_code, run_prepared_code, OUTPUT_PREVIEW_BYTES
+from test_data_store import get_test_data_store
+from workspace_pool import get_workspace_pool
+from rabbitmq_consumer import get_task, run_test_case
+
+logger = logging.getLogger(__name__)
+
+_run_executor = None
+_run_executor_lock = threading.Lock()
+
+
+def _preview(text):
+    if text is not None and len(text) > OUTPUT_PREVIEW_BYTES:
+        return text[:OUTPUT_PREVIEW_BYTES] + '...'
+    return text
+
+def _test_report(result, input_data, expected_output):
+    return {
+        'status': result['status'],
+        'passed': result.get('passed'),
+        'input': input_data,
+        'expected_output': expected_output,
+        'output': _preview(result.get('output', '')),
+        'error': result.get('error', ''),
+        'execution_time_ms': result.get('execution_time_ms', 0),
+        'memory_used_kb': result.get('memory_used_kb', 0)
+    }
+
+def execute_run(run_data):
+    """Запустить код на вводе пользователя или на примерах задачи.
+
+    Попытка в БД не создается. Если в сообщении есть input, код выполняется
+    один раз на нем и вывод возвращается как есть; иначе - на тестах задачи
+    с is_example, с проверкой ответа; если примеров нет, код не запускается
+    и статус будет NO_EXAMPLES. Возвращает None, если задачи нет.
+    """
+    task = get_task(run_data['task_id'])
+    if not task:
+        logger.error(f"Task {run_data['task_id']} not found for run {run_data['run_id']}")
+        return None
+
+    custom_input = run_data.get('input')
+    if custom_input is None and not any(test_case['is_example'] for test_case in task.test_cases):
+        return {
+            'type': 'run_result',
+            'run_id': run_data['run_id'],
+            'user_id': run_data['user_id'],
+            'task_id': run_data['task_id'],
+            'status': 'NO_EXAMPLES',
+            'message': 'У задачи нет примеров: запустите код на своем вводе',
+            'compile_time_ms': 0,
+            'custom_input': False,
+            'tests': []
+        }
+
+    tests = []
+    with get_workspace_pool().workspace() as work_dir:
+        artifact = prepare_code(run_data['code'], work_dir, run_data.get('language', 'python'))
+
+        if artifact['status'] != 'READY':
+            status = artifact['status']
+        elif custom_input is not None:
+            result = run_prepared_code(artifact, custom_input, task.time_limit_ms, task.memory_limit_mb)
+            tests.append(_test_report(result, _preview(custom_input), None))
+            status = result['status']
+        else:
+            store = get_test_data_store()
+            status = 'ACCEPTED'
+            for test_case in task.test_cases:
+                if not test_case['is_example']:
+                    continue
+                result = run_test_case(artifact, test_case, task)
+                tests.append(_test_report(
+                    result,
+                    store.read_preview(test_case['input_digest'], OUTPUT_PREVIEW_BYTES),
+                    store.read_preview(test_case['expected_digest'], OUTPUT_PREVIEW_BYTES)
+                ))
+                if not result['passed'] and status == 'ACCEPTED':
+                    status = result['status']
+
+    return {
+        'type': 'run_result',
+        'run_id': run_data['run_id'],
+        'user_id': run_data['user_id'],
+        'task_id': run_data['task_id'],
+        'status': status,
+        'message': artifact['error'],
+        'compile_time_ms': artifact['compile_time_ms'],
+        'custom_input': custom_input is not None,
+        'tests': tests
+    }
+
+def handle_run_message(connection, channel, delivery_tag, body):
+    """Выполнить запуск в потоке пула, публикация и ack - в потоке соединения"""
+    def on_done(result_data):
+        if result_data is not None:
+            channel.basic_publish(
+                exchange='',
+                routing_key=Config.RABBITMQ_QUEUE_RESULTS,
+                body=json.dumps(result_data),
+                properties=pika.BasicProperties(content_type='application/json')
+            )
+            logger.info(f"Run {result_data['run_id']} finished: {result_data['status']}")
+        channel.basic_ack(delivery_tag=delivery_tag)
+
+    def on_error():
+        channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+
+    try:
+        callback = functools.partial(on_done, execute_run(json.loads(body)))
+    except Exception as e:
+        logger.error(f"Error processing run message: {e}")
+        callback = on_error
+
+    try:
+        connection.add_callback_threadsafe(callback)
+    except Exception as e:
+        logger.error(f"Could not schedule ack for run delivery {delivery_tag}: {e}")
+
+def get_run_executor():
+    """Отдельный пул для запусков, чтобы они не ждали за проверкой попыток"""
+    global _run_executor
+    with _run_executor_lock:
+        if _run_executor is None:
+            _run_executor = ThreadPoolExecutor(
+                max_workers=Config.RUNNER_RUN_WORKERS,
+                thread_name_prefix='run'
+            )
+    return _run_executor
+
+def run_run_consumer_loop():
+    executor = get_run_executor()
+    while True:
+        try:
+            connection = pika.BlockingConnection(
+                pika.ConnectionParameters(
+                    host=Config.RABBITMQ_HOST,
+                    port=Config.RABBITMQ_PORT,
+                    heartbeat=60
+                )
+            )
+            channel = connection.channel()
+            channel.queue_declare(queue=Config.RABBITMQ_QUEUE_CODE_RUN, durable=True)
+            channel.queue_declare(queue=Config.RABBITMQ_QUEUE_RESULTS, durable=True)
+            channel.basic_qos(prefetch_count=Config.RUNNER_RUN_WORKERS)
+
+            def callback(ch, method, properties, body):
+                executor.submit(handle_run_message, connection, ch, method.delivery_tag, body)
+
+            channel.basic_consume(
+                queue=Config.RABBITMQ_QUEUE_CODE_RUN,
+                on_message_callback=callback,
+                auto_ack=False
+            )
+            logger.info(f"Run consumer is waiting for messages in '{Config.RABBITMQ_QUEUE_CODE_RUN}'")
+            channel.start_consuming()
+        except Exception as e:
+            logger.error(f"Run consumer error: {e}")
+            logger.info("Retrying in 10 seconds...")
+            time.sleep(10)
+
+def start_run_consumer():
+    thread = threading.Thread(target=run_run_consumer_loop, name='run-consumer', daemon=True)
+    thread.start()
+    logger.info("✅ Run consumer started in background thread")
+    return thread
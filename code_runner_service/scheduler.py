@@ -0,0 +1,57 @@
+import heapq
+import itertools
+import threading
+
+
+class FairScheduler:
+    """Локальная очередь попыток с честным разделением воркеров между пользователями.
+
+    Раннер забирает из RabbitMQ больше сообщений, чем у него воркеров, и
+    складывает их сюда. Освободившийся воркер берет попытку пользователя, у
+    которого сейчас меньше всего попыток в работе; среди равных - с более
+    высоким приоритетом, затем того, кто дольше ждет. Так пользователь,
+    отправивший сотню попыток, занимает один воркер, а не все.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # user_id -> куча (-priority, seq, item)
+        self._queues = {}
+        # user_id -> сколько его попыток сейчас проверяется
+        self._running = {}
+        self._seq = itertools.count()
+
+    def put(self, user_id, priority, item):
+        with self._lock:
+            heapq.heappush(self._queues.setdefault(user_id, []), (-(priority or 0), next(self._seq), item))
+
+    def get(self):
+        """Взять следующую попытку: (user_id, item) или None, если очередь пуста.
+
+        После проверки нужно вызвать done(user_id).
+        """
+        with self._lock:
+            if not self._queues:
+                return None
+            user_id = min(
+                self._queues,
+                key=lambda user: (self._running.get(user, 0),) + self._queues[user][0][:2]
+            )
+            queue = self._queues[user_id]
+            _, _, item = heapq.heappop(queue)
+            if not queue:
+                del self._queues[user_id]
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            return user_id, item
+
+    def done(self, user_id):
+        with self._lock:
+            running = self._running.get(user_id, 0) - 1
+            if running > 0:
+                self._running[user_id] = running
+            else:
+                self._running.pop(user_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
@@ -0,0 +1,159 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+import pika
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед переподключением слушателя сообщений об изменении задач
+RECONNECT_DELAY = 5
+
+
+class TaskSnapshot:
+    """Неизменяемый снимок задачи и ее тестов, не привязанный к сессии БД.
+
+    Содержит то, что нужно для проверки: лимиты, способ сравнения вывода
+    и тесты в виде словарей {'test_case_id', 'input_digest', 'expected_digest', 'is_example'}
+    (сами данные лежат в TestDataStore). Снимок безопасно передавать между
+    потоками пула.
+    """
+
+    def __init__(self, task, test_cases):
+        self.task_id = task.task_id
+        self.time_limit_ms = task.time_limit_ms
+        self.memory_limit_mb = task.memory_limit_mb
+        self.checker_mode = task.checker_mode
+        self.float_tolerance = task.float_tolerance
+        self.test_set_version = task.test_set_version
+        self.test_cases = test_cases
+        self.checked_at = time.monotonic()
+
+
+class TaskCache:
+    """Ограниченный LRU-кэш снимков задач в памяти процесса.
+
+    Снимок загружается функцией load_snapshot(task_id) (None - задачи нет),
+    а его актуальность проверяется функцией load_version(task_id), которая
+    читает только tasks.test_set_version. Обычно запись сбрасывается сразу
+    по сообщению об изменении тестов, а сверка версии с БД раз в
+    revalidate_after секунд страхует от потерянных сообщений.
+    """
+
+    def __init__(self, load_snapshot, load_version, max_tasks, revalidate_after):
+        self.load_snapshot = load_snapshot
+        self.load_version = load_version
+        self.max_tasks = max_tasks
+        self.revalidate_after = revalidate_after
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, task_id):
+        """Снимок задачи из кэша или из БД (None, если задачи нет)"""
+        with self._lock:
+            snapshot = self._entries.get(task_id)
+            if snapshot is not None:
+                self._entries.move_to_end(task_id)
+                if time.monotonic() - snapshot.checked_at < self.revalidate_after:
+                    self.hits += 1
+                    return snapshot
+
+        if snapshot is not None:
+            # Давно не сверялись с БД: проверяем только версию, тесты не читаем
+            if self.load_version(task_id) == snapshot.test_set_version:
+                snapshot.checked_at = time.monotonic()
+                with self._lock:
+                    self.hits += 1
+                return snapshot
+
+        with self._lock:
+            self.misses += 1
+        snapshot = self.load_snapshot(task_id)
+        if snapshot is None:
+            self.invalidate(task_id)
+            return None
+        self._put(snapshot)
+        return snapshot
+
+    def _put(self, snapshot):
+        with self._lock:
+            self._entries[snapshot.task_id] = snapshot
+            self._entries.move_to_end(snapshot.task_id)
+            while len(self._entries) > self.max_tasks:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, task_id, test_set_version=None):
+        """Сбросить задачу, если ее закэшированная версия старее test_set_version"""
+        with self._lock:
+            snapshot = self._entries.get(task_id)
+            if snapshot is None:
+                return
+            if test_set_version is not None and snapshot.test_set_version >= test_set_version:
+                return
+            del self._entries[task_id]
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'tasks': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def _listen_for_updates(cache):
+    """Слушать сообщения об изменении задач (выполняется в отдельном потоке)"""
+    while True:
+        try:
+            connection = pika.BlockingConnection(pika.ConnectionParameters(
+                host=Config.RABBITMQ_HOST,
+                port=Config.RABBITMQ_PORT,
+                heartbeat=60
+            ))
+            channel = connection.channel()
+            channel.exchange_declare(
+                exchange=Config.RABBITMQ_EXCHANGE_TASK_UPDATES,
+                exchange_type='fanout',
+                durable=True
+            )
+            # У каждого раннера своя временная очередь: сообщение получат все
+            queue = channel.queue_declare(queue='', exclusive=True).method.queue
+            channel.queue_bind(exchange=Config.RABBITMQ_EXCHANGE_TASK_UPDATES, queue=queue)
+
+            # Пока слушателя не было, сообщения могли потеряться
+            cache.clear()
+
+            def on_update(ch, method, properties, body):
+                try:
+                    update = json.loads(body)
+                    cache.invalidate(update['task_id'], update.get('test_set_version'))
+                    logger.info(f"Task {update['task_id']} invalidated (version {update.get('test_set_version')})")
+                except (ValueError, KeyError) as e:
+                    logger.error(f"Invalid task update message: {e}")
+
+            channel.basic_consume(queue=queue, on_message_callback=on_update, auto_ack=True)
+            logger.info(f"Listening for task updates on exchange '{Config.RABBITMQ_EXCHANGE_TASK_UPDATES}'")
+            channel.start_consuming()
+        except pika.exceptions.AMQPError as e:
+            logger.warning(f"Task update listener disconnected: {e}. Retrying in {RECONNECT_DELAY} seconds...")
+            time.sleep(RECONNECT_DELAY)
+
+
+def start_update_listener(cache):
+    thread = threading.Thread(target=_listen_for_updates, args=(cache,), name='task-updates', daemon=True)
+    thread.start()
+    return thread
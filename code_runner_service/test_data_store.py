@@ -0,0 +1,83 @@
+import os
+import mmap
+import hashlib
+import logging
+import tempfile
+import threading
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TestDataStore:
+    """Локальное хранилище входных и эталонных данных тестов с адресацией по содержимому.
+
+    Каждый файл называется sha256 своего содержимого (как tasktestcases.input_sha256
+    и expected_sha256 в БД), поэтому одинаковые данные хранятся один раз, а
+    синхронизация с БД сводится к докачке отсутствующих хешей. Вход теста
+    передается решению открытым дескриптором файла вместо stdin-пайпа, а эталон
+    чекер читает через mmap, не создавая Python-строк.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self.tmp_dir = os.path.join(root_dir, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root_dir, digest[:2], digest)
+
+    def has(self, digest):
+        return digest is not None and os.path.exists(self.path(digest))
+
+    def put_text(self, text):
+        """Сохранить данные теста, возвращает их sha256"""
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            # Файл появляется под своим именем только целиком
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return digest
+
+    def open_fd(self, digest):
+        """Открыть файл на чтение (дескриптор закрывает вызывающий)"""
+        return os.open(self.path(digest), os.O_RDONLY | os.O_CLOEXEC)
+
+    def map(self, digest):
+        """Отобразить файл в память. Пустой файл отобразить нельзя - для него b''"""
+        with open(self.path(digest), 'rb') as data_file:
+            if os.fstat(data_file.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_preview(self, digest, limit):
+        """Начало данных в виде строки (для отчета о непройденном тесте)"""
+        with open(self.path(digest), 'rb') as data_file:
+            data = data_file.read(limit + 1)
+        text = data[:limit].decode('utf-8', errors='replace')
+        if len(data) > limit:
+            text += '...'
+        return text
+
+
+_store = None
+_store_init_lock = threading.Lock()
+
+def get_test_data_store():
+    """Общий на процесс экземпляр хранилища тестов"""
+    global _store
+    with _store_init_lock:
+        if _store is None:
+            _store = TestDataStore(Config.TEST_DATA_DIR)
+    return _store
@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def sandbox(tmp_path_factory):
+    """Модуль code_sandbox с каталогами раннера во временной директории.
+
+    Config читает окружение при импорте, поэтому импорт - после настройки.
+    """
+    root = tmp_path_factory.mktemp('runner')
+    os.environ.setdefault('RABBITMQ_PORT', '5672')
+    os.environ['WORKSPACE_DIR'] = str(root / 'workspaces')
+    os.environ['TEST_DATA_DIR'] = str(root / 'testdata')
+    os.environ['COMPILE_CACHE_DIR'] = str(root / 'binaries')
+    import code_sandbox
+    return code_sandbox
@@ -0,0 +1,39 @@
+import pytest
+
+# Частый прием в олимпиадных решениях: main в потоке с большим стеком
+THREADED_SOLUTION = '''import atexit
+import threading
+
+atexit.register(lambda: print("done"))
+
+def main():
+    a, b = map(int, input().split())
+    print(a + b)
+
+threading.stack_size(64 * 1024 * 1024)
+threading.Thread(target=main).start()
+'''
+
+
+def run_python(sandbox, tmp_path, code, input_data):
+    artifact = sandbox.prepare_code(code, str(tmp_path), 'python')
+    return sandbox.run_prepared_code(artifact, input_data, 2000, 256)
+
+
+@pytest.mark.parametrize('zygote_enabled', [True, False])
+def test_threaded_solution_output(sandbox, tmp_path, monkeypatch, zygote_enabled):
+    monkeypatch.setattr(sandbox.Config, 'PYTHON_ZYGOTE_ENABLED', zygote_enabled)
+    result = run_python(sandbox, tmp_path, THREADED_SOLUTION, '2 3\n')
+    assert result['status'] == 'SUCCESS'
+    assert result['output'] == '5\ndone'
+
+
+def test_zygote_matches_plain_interpreter(sandbox, tmp_path, monkeypatch):
+    outputs = []
+    for zygote_enabled in (True, False):
+        monkeypatch.setattr(sandbox.Config, 'PYTHON_ZYGOTE_ENABLED', zygote_enabled)
+        work_dir = tmp_path / ('zygote' if zygote_enabled else 'exec')
+        work_dir.mkdir()
+        result = run_python(sandbox, work_dir, THREADED_SOLUTION, '40 2\n')
+        outputs.append((result['status'], result['output']))
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,130 @@
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects.postgresql import insert
+from config import Config
+from models import db, VerdictCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Вердикты, которые зависят не от кода, а от состояния раннера (в том числе
+# TL на границе лимита из-за загрузки машины), не кэшируем
+UNCACHEABLE_STATUSES = ('INTERNAL_ERROR', 'CANCELLED', 'TIME_LIMIT_EXCEEDED')
+
+# Меняется вместе с правилами нормализации, чтобы старые ключи не совпали с новыми
+VERDICT_KEY_VERSION = 2
+
+
+def normalize_code(code):
+    """Привести переводы строк к LF. Пробелы не трогаем: они бывают значимы
+    (строковые литералы, отступы)"""
+    return code.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def make_verdict_key(task, language, code):
+    """Ключ кэша: задача, язык, версия набора тестов и нормализованный код"""
+    digest = hashlib.sha256()
+    digest.update(f'v{VERDICT_KEY_VERSION}\0{task.task_id}\0{language}\0{task.test_set_version}\0'.encode('utf-8'))
+    digest.update(normalize_code(code).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class VerdictCache:
+    """Кэш вердиктов в Postgres (таблица verdictcache).
+
+    Ключ включает версию набора тестов, поэтому после изменения тестов старые
+    вердикты не находятся, а триггер в БД сразу удаляет их. Записи старше
+    ttl_s не используются и периодически удаляются. Методы вызываются
+    внутри контекста приложения Flask.
+    """
+
+    def __init__(self, ttl_s, cleanup_interval_s):
+        self.ttl_s = ttl_s
+        self.cleanup_interval_s = cleanup_interval_s
+        self._lock = threading.Lock()
+        self._last_cleanup = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    def _expiry_border(self):
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl_s)
+
+    def get(self, key):
+        """Сохраненный результат проверки или None"""
+        entry = VerdictCacheEntry.query.filter(
+            VerdictCacheEntry.cache_key == key,
+            VerdictCacheEntry.created_at > self._expiry_border()
+        ).first()
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return dict(entry.result)
+
+    def store(self, key, task, result):
+        # Таймаут компиляции, как и TL, может быть следствием загрузки машины
+        if result['status'] in UNCACHEABLE_STATUSES or result.get('compile_timed_out'):
+            return
+        try:
+            statement = insert(VerdictCacheEntry).values(
+                cache_key=key,
+                task_id=task.task_id,
+                test_set_version=task.test_set_version,
+                result=result,
+                created_at=datetime.now(timezone.utc)
+            )
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=[VerdictCacheEntry.cache_key],
+                set_={'result': statement.excluded.result, 'created_at': statement.excluded.created_at}
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not store verdict in cache: {e}")
+            return
+        self._cleanup_if_needed()
+
+    def _cleanup_if_needed(self):
+        with self._lock:
+            if time.monotonic() - self._last_cleanup < self.cleanup_interval_s:
+                return
+            self._last_cleanup = time.monotonic()
+        try:
+            deleted = VerdictCacheEntry.query.filter(
+                VerdictCacheEntry.created_at <= self._expiry_border()
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            if deleted:
+                logger.info(f"Verdict cache removed {deleted} expired entries")
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not clean up verdict cache: {e}")
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+_cache = None
+_cache_init_lock = threading.Lock()
+
+def get_verdict_cache():
+    """Общий на процесс экземпляр кэша вердиктов (None, если кэш выключен в конфиге)"""
+    global _cache
+    if not Config.VERDICT_CACHE_ENABLED:
+        return None
+    with _cache_init_lock:
+        if _cache is None:
+            _cache = VerdictCache(
+                ttl_s=Config.VERDICT_CACHE_TTL_S,
+                cleanup_interval_s=Config.VERDICT_CACHE_CLEANUP_S
+            )
+    return _cache
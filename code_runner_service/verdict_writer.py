@@ -0,0 +1,69 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class VerdictWriter:
+    """Отложенная пакетная запись вердиктов в БД.
+
+    Вердикты копятся в памяти и записываются одним запросом (write_batch)
+    из отдельного потока: как только набралось max_rows строк или с момента
+    появления первой из них прошло flush_interval секунд. submit() сразу
+    возвращает Future, который завершается после коммита пакета значением
+    True (строка обновлена) или False (попытку перехватил другой раннер или
+    запись не удалась). Результат проверки публикуется только после этого.
+    write_batch(rows) возвращает множество обновленных submission_id.
+    """
+
+    def __init__(self, write_batch, flush_interval, max_rows):
+        self._write_batch = write_batch
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._cond = threading.Condition()
+        self._pending = []
+        self._first_at = None
+        self._thread = threading.Thread(target=self._run, name='verdict-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        """Поставить строку (dict с submission_id) в очередь на запись"""
+        future = Future()
+        with self._cond:
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append((row, future))
+            # Поток ждет либо первой строки, либо полного пакета
+            if len(self._pending) == 1 or len(self._pending) >= self.max_rows:
+                self._cond.notify()
+        return future
+
+    def _take_batch(self):
+        with self._cond:
+            while True:
+                if self._pending:
+                    wait = self._first_at + self.flush_interval - time.monotonic()
+                    if wait <= 0 or len(self._pending) >= self.max_rows:
+                        break
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            batch = self._pending[:self.max_rows]
+            del self._pending[:self.max_rows]
+            # Оставшиеся строки ждут уже давно - следующий пакет пишем сразу
+            if self._pending:
+                self._first_at = time.monotonic() - self.flush_interval
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                updated = self._write_batch([row for row, _ in batch])
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} verdicts: {e}")
+                updated = set()
+            for row, future in batch:
+                future.set_result(row['submission_id'] in updated)
@@ -0,0 +1,94 @@
+import os
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class WorkspacePool:
+    """Пул заранее созданных рабочих директорий для проверки попыток.
+
+    Директории лежат в root_dir, который в контейнере смонтирован как tmpfs,
+    поэтому исходник, бинарник и файлы решения не попадают на диск. Директория
+    выдается на всю попытку (исходник пишется один раз на все тесты), а после
+    нее очищается и возвращается в пул вместо удаления и создания заново.
+    Если все директории заняты, создается дополнительная, которая удаляется
+    при возврате сверх размера пула. root_dir принадлежит одному процессу:
+    при создании пула все, что в нем лежит, удаляется.
+    """
+
+    def __init__(self, root_dir, size):
+        self.root_dir = root_dir
+        self.size = size
+        self._lock = threading.Lock()
+        self._free = []
+        self._next_id = 0
+        os.makedirs(root_dir, exist_ok=True)
+        # Остатки от предыдущего запуска процесса
+        for entry in os.scandir(root_dir):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        for _ in range(size):
+            self._free.append(self._create())
+
+    def _create(self):
+        with self._lock:
+            self._next_id += 1
+            path = os.path.join(self.root_dir, f'ws{self._next_id}')
+        os.makedirs(path)
+        return path
+
+    @staticmethod
+    def _clean(path):
+        """Удалить содержимое директории, не удаляя ее саму"""
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        return self._create()
+
+    def release(self, path):
+        try:
+            self._clean(path)
+        except OSError as e:
+            # Решение оставило то, что не удалось убрать - такую директорию не переиспользуем
+            logger.warning(f"Could not clean workspace {path}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(path)
+                return
+        os.rmdir(path)
+
+    @contextmanager
+    def workspace(self):
+        path = self.acquire()
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+
+_pool = None
+_pool_init_lock = threading.Lock()
+
+def get_workspace_pool():
+    """Общий на процесс пул рабочих директорий"""
+    global _pool
+    with _pool_init_lock:
+        if _pool is None:
+            _pool = WorkspacePool(
+                root_dir=Config.WORKSPACE_DIR,
+                size=Config.RUNNER_CONCURRENCY + Config.RUNNER_RUN_WORKERS
+            )
+    return _pool
@@ -0,0 +1,171 @@
+"""Fork-сервер (zygote), через который раннер запускает решения.
+
+Запускается раннером как отдельный интерпретатор и общается с ним через
+unix-сокет (SOCK_SEQPACKET), номер дескриптора которого передается в argv.
+На каждый запрос сервер форкает потомка, подставляет ему stdin/stdout/stderr
+из присланных дескрипторов, выставляет лимиты и либо выполняет Python-код
+прямо в уже прогретом интерпретаторе (mode=python), либо делает exec
+программы (mode=exec). Поскольку сам сервер маленький, ru_maxrss потомка
+из wait4 не раздувается памятью раннера. Раннер получает pid потомка сразу
+после fork, а после его завершения - код выхода, использованное процессорное
+время, пиковую память и время от fork до результата.
+
+Модуль не импортирует ничего из раннера: он выполняется в отдельном процессе.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import resource
+import runpy
+import atexit
+import threading
+import traceback
+
+# Прогреваем модули, которые чаще всего импортируют решения: потомки получат их готовыми
+import math
+import collections
+import itertools
+import functools
+import heapq
+import bisect
+import re
+import string
+import decimal
+import fractions
+import random
+
+MAX_MESSAGE_SIZE = 64 * 1024
+
+
+def print_user_traceback(code_path):
+    """Напечатать текущее исключение, начиная с первого кадра из кода решения.
+
+    Кадры runpy и самого сервера пропускаются, чтобы не раскрывать пути
+    раннера. У SyntaxError кадров решения нет - печатается только сообщение.
+    """
+    exc_type, exc, tb = sys.exc_info()
+    while tb is not None and tb.tb_frame.f_code.co_filename != code_path:
+        tb = tb.tb_next
+    traceback.print_exception(exc_type, exc, tb)
+
+
+def shutdown_interpreter():
+    """Завершение как у обычного интерпретатора: дождаться не-daemon потоков
+    (решения часто запускают main в потоке с большим стеком) и выполнить
+    обработчики atexit. os._exit ни того, ни другого не делает.
+    """
+    threading._shutdown()
+    atexit._run_exitfuncs()
+
+
+def run_child(request, fds):
+    """Выполняется в потомке после fork, никогда не возвращает управление"""
+    exit_code = 1
+    try:
+        stdin_fd, stdout_fd, stderr_fd = fds
+        # Своя сессия, чтобы раннер мог убить потомка вместе с его подпроцессами
+        os.setsid()
+        os.dup2(stdin_fd, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        # Закрываем сокет сервера и исходные дескрипторы
+        os.closerange(3, resource.getrlimit(resource.RLIMIT_NOFILE)[0])
+
+        cpu_limit_s = request['cpu_limit_s']
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit_s, cpu_limit_s + 1))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        # RLIMIT_DATA, а не RLIMIT_AS: V8 резервирует гигабайты адресного пространства
+        # и с RLIMIT_AS node не стартует, а резервирование без записи в DATA не входит
+        memory_limit = request['memory_limit_bytes']
+        resource.setrlimit(resource.RLIMIT_DATA, (memory_limit, memory_limit))
+        output_limit = request['output_limit_bytes']
+        resource.setrlimit(resource.RLIMIT_FSIZE, (output_limit, output_limit))
+
+        os.chdir(request['cwd'])
+
+        if request['mode'] == 'exec':
+            # Интерпретатор игнорирует SIGPIPE и SIGXFSZ, а exec унаследовал бы это
+            signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+            signal.signal(signal.SIGXFSZ, signal.SIG_DFL)
+            argv = request['argv']
+            try:
+                os.execvp(argv[0], argv)
+            except OSError as e:
+                print(f'Could not start {argv[0]}: {e}', file=sys.stderr)
+                sys.stderr.flush()
+                exit_code = 127
+                return
+
+        sys.argv = [request['code_path']]
+        sys.path[0] = request['cwd']
+
+        exit_code = 0
+        try:
+            runpy.run_path(request['code_path'], run_name='__main__')
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except BaseException:
+            print_user_traceback(request['code_path'])
+            exit_code = 1
+
+        try:
+            shutdown_interpreter()
+        except BaseException:
+            print_user_traceback(request['code_path'])
+            exit_code = exit_code or 1
+
+        try:
+            sys.stdout.flush()
+        except Exception:
+            exit_code = exit_code or 1
+        try:
+            sys.stderr.flush()
+        except Exception:
+            pass
+    finally:
+        os._exit(exit_code & 0xff)
+
+
+def serve(sock):
+    while True:
+        try:
+            data, fds, _, _ = socket.recv_fds(sock, MAX_MESSAGE_SIZE, 3)
+        except OSError:
+            return
+        if not data:
+            # Раннер закрыл сокет - завершаемся
+            return
+
+        request = json.loads(data)
+        fork_time = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            run_child(request, fds)
+
+        for fd in fds:
+            os.close(fd)
+        sock.send(json.dumps({'event': 'started', 'pid': pid}).encode('utf-8'))
+
+        _, status, rusage = os.wait4(pid, 0)
+        fork_to_result_ms = (time.monotonic() - fork_time) * 1000
+
+        sock.send(json.dumps({
+            'event': 'exited',
+            'exit_code': os.waitstatus_to_exitcode(status),
+            'cpu_time_ms': int((rusage.ru_utime + rusage.ru_stime) * 1000),
+            'max_rss_kb': rusage.ru_maxrss,
+            'fork_to_result_ms': round(fork_to_result_ms, 3)
+        }).encode('utf-8'))
+
+
+if __name__ == '__main__':
+    serve(socket.socket(fileno=int(sys.argv[1])))
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react'
+import React, { useState, useEffect, useCallback, useRef } from 'react'
 import { useParams, useNavigate } from 'react-router-dom'
 import Editor from '@monaco-editor/react'
 import { useAuth } from '../contexts/AuthContext'
@@ -21,12 +21,18 @@ const TaskDetail = () => {
   const [code, setCode] = useState('')
   const [language, setLanguage] = useState('python')
   const [result, setResult] = useState(null)
+  const [progress, setProgress] = useState(null)
   const [loading, setLoading] = useState(false)
   const [submitting, setSubmitting] = useState(false)
   const [nextTaskId, setNextTaskId] = useState(null)
   const [showHistory, setShowHistory] = useState(false)
   const [submissions, setSubmissions] = useState([])
   const [loadingHistory, setLoadingHistory] = useState(false)
+  const [runInput, setRunInput] = useState('')
+  const [running, setRunning] = useState(false)
+  const [runResult, setRunResult] = useState(null)
+  // run_id последнего запуска: результаты прежних запусков игнорируем
+  const runIdRef = useRef(null)
 
   // Функция для преобразования \n в настоящие переносы строк
   const formatTextWithNewlines = (text) => {
@@ -40,11 +46,16 @@ const TaskDetail = () => {
     setCode('')
     setLanguage('python')
     setResult(null)
+    setProgress(null)
     setLoading(false)
     setSubmitting(false)
     setNextTaskId(null)
     setShowHistory(false)
     setSubmissions([])
+    setRunInput('')
+    setRunning(false)
+    setRunResult(null)
+    runIdRef.current = null
     
     // Устанавливаем начальный код для новой задачи
     setInitialCode()
@@ -57,6 +68,7 @@ const TaskDetail = () => {
   const handleSubmissionResult = useCallback((data) => {
     console.log('Received submission result:', data)
     setResult(data)
+    setProgress(null)
     setSubmitting(false)
     
     // После получения результата обновляем историю
@@ -69,6 +81,18 @@ const TaskDetail = () => {
     }
   }, [user, taskId])
 
+  // Промежуточный ход проверки: приходит до итогового результата
+  const handleSubmissionProgress = useCallback((data) => {
+    setProgress(data)
+  }, [])
+
+  // Результат запуска на примерах или своем вводе (попытка не сохраняется)
+  const handleRunResult = useCallback((data) => {
+    if (data.run_id !== runIdRef.current) return
+    setRunResult(data)
+    setRunning(false)
+  }, [])
+
   useEffect(() => {
     fetchTask()
   }, [taskId])
@@ -86,15 +110,21 @@ const TaskDetail = () => {
     // Убираем старые слушатели перед добавлением новых
     socket.off('submission_result', handleSubmissionResult)
     socket.on('submission_result', handleSubmissionResult)
+    socket.off('submission_progress', handleSubmissionProgress)
+    socket.on('submission_progress', handleSubmissionProgress)
+    socket.off('run_result', handleRunResult)
+    socket.on('run_result', handleRunResult)
 
     // Очистка при размонтировании
     return () => {
       if (socket) {
         console.log('Cleaning up WebSocket listeners')
         socket.off('submission_result', handleSubmissionResult)
+        socket.off('submission_progress', handleSubmissionProgress)
+        socket.off('run_result', handleRunResult)
       }
     }
-  }, [socket, isConnected, taskId, handleSubmissionResult])
+  }, [socket, isConnected, taskId, handleSubmissionResult, handleSubmissionProgress, handleRunResult])
 
   const setInitialCode = () => {
     const templates = {
@@ -161,6 +191,8 @@ const TaskDetail = () => {
       case 'ACCEPTED': return 'status-accepted'
       case 'WRONG_ANSWER': return 'status-wrong'
       case 'TIME_LIMIT_EXCEEDED': return 'status-timeout'
+      case 'MEMORY_LIMIT_EXCEEDED': return 'status-timeout'
+      case 'OUTPUT_LIMIT_EXCEEDED': return 'status-timeout'
       case 'RUNTIME_ERROR': return 'status-error'
       case 'COMPILATION_ERROR': return 'status-error'
       default: return 'status-pending'
@@ -180,6 +212,7 @@ const TaskDetail = () => {
 
     setSubmitting(true)
     setResult(null)
+    setProgress(null)
     setNextTaskId(null)
 
     console.log('Submitting code for task:', taskId)
@@ -202,6 +235,44 @@ const TaskDetail = () => {
     }
   }
 
+  const handleRun = async () => {
+    if (!code.trim()) {
+      alert('Код не может быть пустым')
+      return
+    }
+    if (running) return
+
+    setRunning(true)
+    setRunResult(null)
+    runIdRef.current = null
+
+    try {
+      // Пустой ввод - запуск на примерах задачи
+      const response = await taskService.runCode({
+        task_id: parseInt(taskId),
+        code: code,
+        language: language,
+        input: runInput.trim() ? runInput : undefined
+      })
+      runIdRef.current = response.data.run_id
+    } catch (error) {
+      console.error('Ошибка запуска кода:', error)
+      setRunResult({
+        status: 'ERROR',
+        message: error.response?.data?.msg || 'Ошибка запуска кода',
+        tests: []
+      })
+      setRunning(false)
+    }
+  }
+
+  const getRunStatusMessage = (status) => {
+    if (status === 'ACCEPTED') return 'Все примеры пройдены'
+    if (status === 'SUCCESS') return 'Выполнено'
+    if (status === 'NO_EXAMPLES') return 'Нет примеров для запуска'
+    return getStatusMessage(status)
+  }
+
   const handleNextTask = () => {
     if (nextTaskId) {
       navigate(`/task/${nextTaskId}`)
@@ -211,8 +282,11 @@ const TaskDetail = () => {
   const getStatusMessage = (status) => {
     const statusMessages = {
       'ACCEPTED': 'Задача успешно решена!',
+      'SUCCESS': 'Пройден',
       'WRONG_ANSWER': 'Неверный ответ',
       'TIME_LIMIT_EXCEEDED': 'Превышено время выполнения',
+      'MEMORY_LIMIT_EXCEEDED': 'Превышен лимит памяти',
+      'OUTPUT_LIMIT_EXCEEDED': 'Превышен лимит вывода',
       'RUNTIME_ERROR': 'Ошибка выполнения',
       'COMPILATION_ERROR': 'Ошибка компиляции',
       'INTERNAL_ERROR': 'Внутренняя ошибка системы'
@@ -320,13 +394,22 @@ const TaskDetail = () => {
             </div>
             
             {!showHistory && (
-              <button 
-                onClick={handleSubmit} 
-                disabled={submitting || !isConnected}
-                className="submit-btn"
-              >
-                {submitting ? 'Отправка...' : isConnected ? 'Отправить решение' : 'Ожидание соединения...'}
-              </button>
+              <div className="editor-actions">
+                <button
+                  onClick={handleRun}
+                  disabled={running || submitting || !isConnected}
+                  className="submit-btn run-btn"
+                >
+                  {running ? 'Запуск...' : 'Запустить'}
+                </button>
+                <button 
+                  onClick={handleSubmit} 
+                  disabled={submitting || !isConnected}
+                  className="submit-btn"
+                >
+                  {submitting ? 'Отправка...' : isConnected ? 'Отправить решение' : 'Ожидание соединения...'}
+                </button>
+              </div>
             )}
           </div>
 
@@ -351,6 +434,55 @@ const TaskDetail = () => {
               />
             </div>
 
+              <textarea
+                value={runInput}
+                onChange={(e) => setRunInput(e.target.value)}
+                className="run-input"
+                placeholder="Свой ввод для запуска (пусто - запуск на примерах)"
+                rows={3}
+                disabled={running}
+              />
+
+              {runResult && (
+                <div className="result-area">
+                  <div className={`result ${['ACCEPTED', 'SUCCESS'].includes(runResult.status) ? 'success' : 'error'}`}>
+                    <h4>Результат запуска:</h4>
+                    <p><strong>Статус:</strong> {getRunStatusMessage(runResult.status)}</p>
+
+                    {runResult.message && (
+                      <div className="result-message">
+                        <strong>Сообщение:</strong> {runResult.message}
+                      </div>
+                    )}
+
+                    {runResult.tests.map((test, index) => (
+                      <div key={index} className="test-details">
+                        <div className="failed-test">
+                          <strong>{runResult.custom_input ? 'Свой ввод' : `Пример ${index + 1}`}:</strong> {getStatusMessage(test.status)}, {test.execution_time_ms}ms
+                          <pre>Вход: {test.input}</pre>
+                          {test.expected_output !== null && (
+                            <pre>Ожидалось: {test.expected_output}</pre>
+                          )}
+                          <pre>Получено: {test.output}</pre>
+                          {test.error && <pre>Ошибка: {test.error}</pre>}
+                        </div>
+                      </div>
+                    ))}
+                  </div>
+                </div>
+              )}
+
+              {submitting && progress && (
+                <div className="result-area">
+                  <div className="result">
+                    <p><strong>Проверка:</strong> {progress.passed_tests}/{progress.total_tests} тестов пройдено</p>
+                    {progress.last_test && (
+                      <p>Тест {progress.last_test}: {getStatusMessage(progress.last_status)}, {progress.last_time_ms}ms</p>
+                    )}
+                  </div>
+                </div>
+              )}
+
               {result && (
                 <div className="result-area">
                   <div className={`result ${result.status === 'ACCEPTED' ? 'success' : 'error'}`}>
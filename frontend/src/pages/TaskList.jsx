@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import { Link } from 'react-router-dom'
 import { useAuth } from '../contexts/AuthContext'
 import { taskService } from '../services/api'
@@ -7,29 +7,52 @@ import LoadingSpinner from '../components/LoadingSpinner'
 import { DIFFICULTY_LEVELS } from '../utils/constants'
 import './TaskList.css'
 
+const PAGE_SIZE = 50
+
 const TaskList = () => {
   const [tasks, setTasks] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [themes, setThemes] = useState([])
   const [solvedTasks, setSolvedTasks] = useState(new Set())
   const [filter, setFilter] = useState('all')
   const [difficulty, setDifficulty] = useState('all')
   const [loading, setLoading] = useState(true)
   const { user } = useAuth()
+  // Номер последнего запроса: ответы на запросы со старыми фильтрами отбрасываем
+  const requestIdRef = useRef(0)
 
   useEffect(() => {
-    fetchTasks()
     fetchThemes()
     fetchSolvedTasks()
   }, [])
 
-  const fetchTasks = async () => {
+  // Фильтры применяет сервер, поэтому при их смене список грузится заново
+  useEffect(() => {
+    fetchTasks(null)
+  }, [filter, difficulty])
+
+  const fetchTasks = async (cursor) => {
+    const requestId = ++requestIdRef.current
+    const params = { limit: PAGE_SIZE }
+    if (filter !== 'all') params.theme_id = filter
+    if (difficulty !== 'all') params.difficulty = difficulty
+    if (cursor) params.cursor = cursor
+
     try {
-      const response = await taskService.getTasks()
-      setTasks(response.data)
+      setLoadingMore(Boolean(cursor))
+      const response = await taskService.getTasksPage(params)
+      if (requestId !== requestIdRef.current) return
+      const { items, next_cursor } = response.data
+      setTasks(prev => cursor ? [...prev, ...items] : items)
+      setNextCursor(next_cursor)
     } catch (error) {
       console.error('Ошибка загрузки задач:', error)
     } finally {
-      setLoading(false)
+      if (requestId === requestIdRef.current) {
+        setLoading(false)
+        setLoadingMore(false)
+      }
     }
   }
 
@@ -55,12 +78,6 @@ const TaskList = () => {
     return `/theory/${themeId}`
   }
 
-  const filteredTasks = tasks.filter(task => {
-    const matchesTheme = filter === 'all' || task.theme_id == filter
-    const matchesDifficulty = difficulty === 'all' || task.difficulty_level === difficulty
-    return matchesTheme && matchesDifficulty
-  })
-
   if (loading) {
     return <LoadingSpinner message="Загрузка задач..." />
   }
@@ -94,7 +111,7 @@ const TaskList = () => {
       </div>
 
       <div className="tasks-grid">
-        {filteredTasks.map(task => (
+        {tasks.map(task => (
           <div key={task.task_id} className="task-card">
             <div className="task-header">
               <h3>{task.title}</h3>
@@ -110,7 +127,7 @@ const TaskList = () => {
             </div>
             
             <div className="task-theme">
-              Тема: {themes.find(t => t.theme_id === task.theme_id)?.title || 'Неизвестно'}
+              Тема: {task.theme_title || 'Неизвестно'}
               <Link to={getTheoryLink(task.theme_id)} className="theory-link">
                 Теория
               </Link>
@@ -131,7 +148,17 @@ const TaskList = () => {
         ))}
       </div>
 
-      {filteredTasks.length === 0 && (
+      {nextCursor && (
+        <button
+          onClick={() => fetchTasks(nextCursor)}
+          disabled={loadingMore}
+          className="load-more-btn"
+        >
+          {loadingMore ? 'Загрузка...' : 'Показать еще'}
+        </button>
+      )}
+
+      {tasks.length === 0 && (
         <div className="no-tasks">Задачи не найдены</div>
       )}
     </div>
@@ -88,12 +88,15 @@ mainAPI.interceptors.response.use(
 // API методы
 export const taskService = {
   getTasks: () => mainAPI.get('/tasks/'),
+  // params: { theme_id: [..], difficulty: [..], sort, order, limit, cursor }
+  getTasksPage: (params) => mainAPI.get('/tasks/list', { params, paramsSerializer: { indexes: null } }),
   getTask: (id) => mainAPI.get(`/tasks/${id}`),
   submitCode: (data) => mainAPI.post('/submit_code', data),
   getThemes: () => mainAPI.get('/themes/'),
   getUserSolved: (userId) => mainAPI.get(`/user_solved/${userId}`),
   getTheory: (themeId) => mainAPI.get(`/theory/${themeId}`),
   markSolved: (data) => mainAPI.post('/mark_solved', data),
+  runCode: (data) => mainAPI.post('/run_code', data),
   getUserTaskSubmissions: (userId, taskId) => mainAPI.get(`/user_submissions/${userId}/${taskId}`)
 }
 
@@ -27,9 +27,12 @@ export const LANGUAGES = [
 
 export const SUBMISSION_STATUS = {
   PENDING: 'В обработке',
+  RUNNING: 'Проверяется',
   ACCEPTED: 'Принято',
   WRONG_ANSWER: 'Неверный ответ',
   TIME_LIMIT_EXCEEDED: 'Превышено время',
+  MEMORY_LIMIT_EXCEEDED: 'Превышена память',
+  OUTPUT_LIMIT_EXCEEDED: 'Превышен вывод',
   RUNTIME_ERROR: 'Ошибка выполнения',
   COMPILATION_ERROR: 'Ошибка компиляции',
   INTERNAL_ERROR: 'Внутренняя ошибка'
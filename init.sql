@@ -30,16 +30,31 @@ CREATE TABLE IF NOT EXISTS tasks (
     description TEXT NOT NULL,
     difficulty_level VARCHAR(20) NOT NULL,
     time_limit_ms INTEGER NOT NULL,
-    memory_limit_mb INTEGER NOT NULL
+    memory_limit_mb INTEGER NOT NULL,
+    -- Способ сравнения вывода: 'exact', 'tokens' или 'float'
+    checker_mode VARCHAR(20) NOT NULL DEFAULT 'exact',
+    -- Допуск для checker_mode = 'float' (NULL - допуск по умолчанию)
+    float_tolerance DOUBLE PRECISION,
+    -- Версия набора тестов и параметров проверки (по ней раннер кэширует задачу)
+    test_set_version INTEGER NOT NULL DEFAULT 1
 );
 
+-- Для списка задач по страницам (/tasks/list): фильтр по теме и сложности
+-- и keyset-пагинация по (сортировка, task_id)
+CREATE INDEX IF NOT EXISTS idx_tasks_theme_difficulty ON tasks (theme_id, difficulty_level, task_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_difficulty ON tasks (difficulty_level, task_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_title ON tasks (title, task_id);
+
 -- Создание таблицы tasktestcases
 CREATE TABLE IF NOT EXISTS tasktestcases (
     test_case_id SERIAL PRIMARY KEY,
     task_id INTEGER NOT NULL REFERENCES tasks(task_id),
     input_data TEXT NOT NULL,
     expected_output TEXT NOT NULL,
-    is_example BOOLEAN NOT NULL DEFAULT FALSE
+    is_example BOOLEAN NOT NULL DEFAULT FALSE,
+    -- sha256 от input_data/expected_output в UTF-8, по ним раннер хранит тесты на диске
+    input_sha256 CHAR(64),
+    expected_sha256 CHAR(64)
 );
 
 -- Создание таблицы submissions
@@ -53,9 +68,63 @@ CREATE TABLE IF NOT EXISTS submissions (
     status VARCHAR(50),
     run_time INTEGER,
     memory_used INTEGER,
-    language VARCHAR(50)
+    language VARCHAR(50),
+    -- Раннер, проверяющий попытку (status = 'RUNNING'), и время захвата
+    claimed_by VARCHAR(100),
+    claimed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Частичный индекс для поиска решенных пользователем задач
+CREATE INDEX IF NOT EXISTS idx_submissions_solved ON submissions (user_id, task_id) WHERE is_complete;
+
+-- Поиск попыток с просроченной арендой
+CREATE INDEX IF NOT EXISTS idx_submissions_running ON submissions (claimed_at) WHERE status = 'RUNNING';
+
+-- Для подсчета недавних попыток пользователя при выборе приоритета
+CREATE INDEX IF NOT EXISTS idx_submissions_user_date ON submissions (user_id, date);
+
+-- Ревизия каталога (темы, теория, задачи, тесты): повышается триггерами при
+-- любом изменении, по ней main_service сбрасывает HTTP-кэш каталога
+CREATE TABLE IF NOT EXISTS catalogrevision (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    revision BIGINT NOT NULL DEFAULT 1
+);
+
+INSERT INTO catalogrevision (id, revision) VALUES (1, 1) ON CONFLICT DO NOTHING;
+
+-- Outbox попыток: строка пишется в одной транзакции с попыткой, а фоновый
+-- relay в main_service публикует ее в RabbitMQ и удаляет
+CREATE TABLE IF NOT EXISTS submissionoutbox (
+    outbox_id BIGSERIAL PRIMARY KEY,
+    submission_id INTEGER NOT NULL REFERENCES submissions(submission_id) ON DELETE CASCADE,
+    priority INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    -- Раньше этого времени строку не публикуем (отсрочка после неудачной публикации)
+    available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX IF NOT EXISTS idx_submissionoutbox_available ON submissionoutbox (available_at, outbox_id);
+
+-- Множество решенных пользователем задач: бит task_id в solved_bitmap
+-- (нумерация битов как у set_bit/get_bit: байт task_id / 8, бит task_id % 8 от младшего)
+CREATE TABLE IF NOT EXISTS usersolvedtasks (
+    user_id INTEGER PRIMARY KEY,
+    solved_bitmap BYTEA NOT NULL DEFAULT ''::bytea
+);
+
+-- Кэш вердиктов для повторных отправок одного и того же кода
+-- (cache_key - sha256 от задачи, языка, версии тестов и нормализованного кода)
+CREATE TABLE IF NOT EXISTS verdictcache (
+    cache_key CHAR(64) PRIMARY KEY,
+    task_id INTEGER NOT NULL REFERENCES tasks(task_id),
+    test_set_version INTEGER NOT NULL,
+    result JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_verdictcache_created_at ON verdictcache (created_at);
+
 -- Создание таблицы comments
 CREATE TABLE IF NOT EXISTS comments (
     comment_id SERIAL PRIMARY KEY,
@@ -78,6 +147,129 @@ CREATE TABLE IF NOT EXISTS theorycomments (
     comment_id INTEGER UNIQUE NOT NULL REFERENCES comments(comment_id)
 );
 
+CREATE OR REPLACE FUNCTION set_test_case_digests() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.input_sha256 := encode(sha256(convert_to(NEW.input_data, 'UTF8')), 'hex');
+    NEW.expected_sha256 := encode(sha256(convert_to(NEW.expected_output, 'UTF8')), 'hex');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasktestcases_set_digests ON tasktestcases;
+CREATE TRIGGER tasktestcases_set_digests
+    BEFORE INSERT OR UPDATE OF input_data, expected_output ON tasktestcases
+    FOR EACH ROW EXECUTE FUNCTION set_test_case_digests();
+
+CREATE OR REPLACE FUNCTION mark_task_solved(p_user_id INTEGER, p_task_id INTEGER) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO usersolvedtasks (user_id) VALUES (p_user_id)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    -- Дополняем битовую карту нулями до нужной длины и ставим бит задачи
+    UPDATE usersolvedtasks
+    SET solved_bitmap = set_bit(
+        solved_bitmap || decode(repeat('00', greatest(p_task_id / 8 + 1 - length(solved_bitmap), 0)), 'hex'),
+        p_task_id, 1)
+    WHERE user_id = p_user_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Битовая карта обновляется при записи любого принятого решения
+CREATE OR REPLACE FUNCTION submissions_mark_solved() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM mark_task_solved(NEW.user_id, NEW.task_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS submissions_mark_solved ON submissions;
+CREATE TRIGGER submissions_mark_solved
+    AFTER INSERT OR UPDATE OF is_complete ON submissions
+    FOR EACH ROW WHEN (NEW.is_complete)
+    EXECUTE FUNCTION submissions_mark_solved();
+
+-- Однократное заполнение битовых карт по решениям, принятым до появления триггера
+-- (set_bit идемпотентен, поэтому повторный запуск скрипта ничего не портит)
+SELECT mark_task_solved(solved.user_id, solved.task_id)
+FROM (SELECT DISTINCT user_id, task_id FROM submissions WHERE is_complete) AS solved;
+
+-- Любое изменение тестов задачи или ее параметров проверки повышает test_set_version
+CREATE OR REPLACE FUNCTION bump_test_set_version() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE tasks SET test_set_version = test_set_version + 1 WHERE task_id = OLD.task_id;
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.task_id <> OLD.task_id) THEN
+        UPDATE tasks SET test_set_version = test_set_version + 1 WHERE task_id = NEW.task_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasktestcases_bump_version ON tasktestcases;
+CREATE TRIGGER tasktestcases_bump_version
+    AFTER INSERT OR UPDATE OR DELETE ON tasktestcases
+    FOR EACH ROW EXECUTE FUNCTION bump_test_set_version();
+
+CREATE OR REPLACE FUNCTION bump_task_checker_version() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.time_limit_ms IS DISTINCT FROM OLD.time_limit_ms
+        OR NEW.memory_limit_mb IS DISTINCT FROM OLD.memory_limit_mb
+        OR NEW.checker_mode IS DISTINCT FROM OLD.checker_mode
+        OR NEW.float_tolerance IS DISTINCT FROM OLD.float_tolerance THEN
+        NEW.test_set_version := OLD.test_set_version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_bump_version ON tasks;
+CREATE TRIGGER tasks_bump_version
+    BEFORE UPDATE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION bump_task_checker_version();
+
+-- Вердикты, полученные на старой версии тестов, больше не нужны
+CREATE OR REPLACE FUNCTION drop_stale_verdicts() RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM verdictcache WHERE task_id = NEW.task_id AND test_set_version < NEW.test_set_version;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_drop_stale_verdicts ON tasks;
+CREATE TRIGGER tasks_drop_stale_verdicts
+    AFTER UPDATE ON tasks
+    FOR EACH ROW WHEN (NEW.test_set_version IS DISTINCT FROM OLD.test_set_version)
+    EXECUTE FUNCTION drop_stale_verdicts();
+
+-- Любая запись в таблицы каталога повышает его ревизию (один раз на оператор)
+CREATE OR REPLACE FUNCTION bump_catalog_revision() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE catalogrevision SET revision = revision + 1 WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS theme_bump_catalog_revision ON theme;
+CREATE TRIGGER theme_bump_catalog_revision
+    AFTER INSERT OR UPDATE OR DELETE ON theme
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_revision();
+
+DROP TRIGGER IF EXISTS algorythmtheories_bump_catalog_revision ON algorythmtheories;
+CREATE TRIGGER algorythmtheories_bump_catalog_revision
+    AFTER INSERT OR UPDATE OR DELETE ON algorythmtheories
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_revision();
+
+DROP TRIGGER IF EXISTS tasks_bump_catalog_revision ON tasks;
+CREATE TRIGGER tasks_bump_catalog_revision
+    AFTER INSERT OR UPDATE OR DELETE ON tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_revision();
+
+DROP TRIGGER IF EXISTS tasktestcases_bump_catalog_revision ON tasktestcases;
+CREATE TRIGGER tasktestcases_bump_catalog_revision
+    AFTER INSERT OR UPDATE OR DELETE ON tasktestcases
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_revision();
+
 -- Вставка тестовых данных
 
 -- Темы
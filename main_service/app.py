@@ -5,6 +5,7 @@ from flask_jwt_extended import JWTManager
 from config import Config
 from models import db
 from routes import main_bp
+from outbox_relay import start_outbox_relay
 
 def create_app():
     app = Flask(__name__)
@@ -29,6 +30,9 @@ def create_app():
         # Если access_token истек, клиент должен использовать refresh
         return jsonify({'msg': 'Срок действия токена истек', 'expired': True}), 401
 
+    # Фоновая отправка попыток из outbox в RabbitMQ
+    start_outbox_relay(app)
+
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,106 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response
+from config import Config
+from models import db, CatalogRevision
+
+
+class CatalogCache:
+    """Кэш ответов эндпоинтов каталога (темы, теория, задачи) в памяти процесса.
+
+    Ответы хранятся вместе с ревизией каталога, на которой они получены.
+    Ревизию повышают триггеры в БД; процесс перечитывает ее не чаще раза в
+    revision_ttl секунд, поэтому чужие изменения видны с такой задержкой, а
+    свои (invalidate()) - сразу.
+    """
+
+    def __init__(self, max_entries, revision_ttl):
+        self.max_entries = max_entries
+        self.revision_ttl = revision_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._revision = None
+        self._revision_checked_at = 0.0
+
+    def current_revision(self):
+        with self._lock:
+            if self._revision is not None and time.monotonic() - self._revision_checked_at < self.revision_ttl:
+                return self._revision
+        revision = db.session.query(CatalogRevision.revision).filter_by(id=1).scalar() or 0
+        with self._lock:
+            if revision != self._revision:
+                self._entries.clear()
+                self._revision = revision
+            self._revision_checked_at = time.monotonic()
+        return revision
+
+    def get(self, key, revision):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['revision'] != revision:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, revision, body, status):
+        entry = {
+            'revision': revision,
+            'body': body,
+            'status': status,
+            # Сильный ETag: меняется вместе с байтами ответа
+            'etag': f'{revision}-{hashlib.sha256(body).hexdigest()[:32]}'
+        }
+        with self._lock:
+            if revision == self._revision:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self):
+        """Каталог изменен этим процессом: перечитать ревизию при следующем запросе"""
+        with self._lock:
+            self._entries.clear()
+            self._revision_checked_at = 0.0
+
+
+_cache = None
+_cache_init_lock = threading.Lock()
+
+def get_catalog_cache():
+    global _cache
+    with _cache_init_lock:
+        if _cache is None:
+            _cache = CatalogCache(
+                max_entries=Config.CATALOG_CACHE_MAX_ENTRIES,
+                revision_ttl=Config.CATALOG_REVISION_TTL_S
+            )
+    return _cache
+
+def catalog_cached(fn):
+    """Кэшировать ответ эндпоинта каталога и отвечать 304 на If-None-Match.
+
+    Ключ кэша - путь с параметрами запроса. Кэшируются только ответы 200 и 404.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        cache = get_catalog_cache()
+        revision = cache.current_revision()
+        key = request.full_path
+        entry = cache.get(key, revision)
+        if entry is None:
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code not in (200, 404):
+                return response
+            entry = cache.put(key, revision, response.get_data(), response.status_code)
+
+        response = make_response(entry['body'], entry['status'])
+        response.mimetype = 'application/json'
+        response.set_etag(entry['etag'])
+        response.headers['Cache-Control'] = f'public, max-age={Config.CATALOG_CACHE_MAX_AGE_S}, must-revalidate'
+        return response.make_conditional(request)
+    return wrapper
@@ -17,4 +17,49 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     
     # Имя очереди для отправки кода на исполнение
-    RABBITMQ_QUEUE_CODE_RUNNER = 'code_submission_queue'
\ No newline at end of file
+    RABBITMQ_QUEUE_CODE_RUNNER = 'code_submission_queue'
+    # Очередь запусков на своем вводе / примерах. Запуск, который раннер
+    # не взял за RUN_MESSAGE_TTL_MS, уже никому не нужен и отбрасывается
+    RABBITMQ_QUEUE_CODE_RUN = 'code_run_queue'
+    RUN_MESSAGE_TTL_MS = int(os.environ.get('RUN_MESSAGE_TTL_MS', 30000))
+    RUN_INPUT_MAX_KB = int(os.environ.get('RUN_INPUT_MAX_KB', 1024))
+    
+    # Максимальный приоритет сообщений в очереди попыток (x-max-priority)
+    RABBITMQ_QUEUE_MAX_PRIORITY = 10
+    
+    # Приоритет попытки: чем меньше лимит времени задачи, тем выше, и он
+    # снижается на 1 за каждые SUBMISSION_BURST_SIZE попыток пользователя
+    # за последние SUBMISSION_LOAD_WINDOW_S секунд
+    SUBMISSION_LOAD_WINDOW_S = int(os.environ.get('SUBMISSION_LOAD_WINDOW_S', 60))
+    SUBMISSION_BURST_SIZE = int(os.environ.get('SUBMISSION_BURST_SIZE', 5))
+    
+    # Fanout exchange для сообщений раннерам об изменении тестов задачи
+    RABBITMQ_EXCHANGE_TASK_UPDATES = 'task_updates'
+    
+    # Издатель RabbitMQ: одно долгоживущее соединение с подтверждениями публикации,
+    # которое обслуживает отдельный поток. Если брокер не подтвердил сообщение за
+    # RABBITMQ_PUBLISH_TIMEOUT_S или не принял подключение за RABBITMQ_CONNECT_TIMEOUT_S,
+    # запрос получает 503. После неудачи следующие RABBITMQ_RETRY_INTERVAL_S секунд
+    # 503 отдается сразу
+    RABBITMQ_PUBLISH_TIMEOUT_S = float(os.environ.get('RABBITMQ_PUBLISH_TIMEOUT_S', 2))
+    RABBITMQ_CONNECT_TIMEOUT_S = float(os.environ.get('RABBITMQ_CONNECT_TIMEOUT_S', 2))
+    RABBITMQ_RETRY_INTERVAL_S = float(os.environ.get('RABBITMQ_RETRY_INTERVAL_S', 5))
+    
+    # Outbox попыток: relay публикует до OUTBOX_BATCH_SIZE строк за транзакцию и
+    # проверяет outbox раз в OUTBOX_POLL_INTERVAL_S (новая попытка будит его сразу).
+    # После неудачной публикации строка откладывается на 2^attempts секунд, но
+    # не больше чем на OUTBOX_MAX_BACKOFF_S
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+    OUTBOX_POLL_INTERVAL_S = float(os.environ.get('OUTBOX_POLL_INTERVAL_S', 1))
+    OUTBOX_MAX_BACKOFF_S = int(os.environ.get('OUTBOX_MAX_BACKOFF_S', 60))
+    
+    # Исходник попытки кладется в сообщение (zlib), только если сжатый он не
+    # больше INLINE_CODE_MAX_BYTES; иначе раннер читает его из submissions.code
+    INLINE_CODE_MAX_BYTES = int(os.environ.get('INLINE_CODE_MAX_BYTES', 2048))
+    
+    # Кэш ответов каталога (задачи, темы, теория). Ревизия каталога из БД
+    # перечитывается раз в CATALOG_REVISION_TTL_S секунд; браузер может не
+    # перепроверять ответ CATALOG_CACHE_MAX_AGE_S секунд (0 - всегда через ETag)
+    CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', 1024))
+    CATALOG_REVISION_TTL_S = float(os.environ.get('CATALOG_REVISION_TTL_S', 5))
+    CATALOG_CACHE_MAX_AGE_S = int(os.environ.get('CATALOG_CACHE_MAX_AGE_S', 0))
@@ -35,6 +35,9 @@ class Task(db.Model):
     difficulty_level = db.Column(db.String(20), nullable=False) # 'EASY', 'MEDIUM', 'HARD'
     time_limit_ms = db.Column(db.Integer, nullable=False)
     memory_limit_mb = db.Column(db.Integer, nullable=False)
+    checker_mode = db.Column(db.String(20), nullable=False, default='exact') # 'exact', 'tokens', 'float'
+    float_tolerance = db.Column(db.Float, nullable=True)
+    test_set_version = db.Column(db.Integer, nullable=False, default=1)
     
     theme = db.relationship('Theme', backref='tasks')
     
@@ -70,6 +73,8 @@ class Submission(db.Model):
     run_time = db.Column(db.Integer, nullable=True) 
     memory_used = db.Column(db.Integer, nullable=True)
     language = db.Column(db.String(50), nullable=True)
+    claimed_by = db.Column(db.String(100), nullable=True)
+    claimed_at = db.Column(db.DateTime(timezone=True), nullable=True)
     
     task = db.relationship('Task', backref='submissions')
     
@@ -77,6 +82,43 @@ class Submission(db.Model):
         db.Index('idx_user_task_complete', 'user_id', 'is_complete'),
     )
     
+# таблица CatalogRevision (одна строка: ревизия каталога, повышается триггерами
+# на theme, algorythmtheories, tasks и tasktestcases)
+class CatalogRevision(db.Model):
+    __tablename__ = 'catalogrevision'
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.BigInteger, nullable=False, default=1)
+    
+# таблица SubmissionOutbox (попытки, еще не отправленные в RabbitMQ;
+# пишется вместе с попыткой, публикует и удаляет outbox_relay)
+class SubmissionOutbox(db.Model):
+    __tablename__ = 'submissionoutbox'
+    outbox_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    submission_id = db.Column(db.BigInteger, db.ForeignKey('submissions.submission_id', ondelete='CASCADE'), nullable=False)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.current_timestamp())
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    available_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.current_timestamp())
+    
+    submission = db.relationship('Submission')
+    
+#----------------------------------------------------------------------------------------------------
+
+# таблица UserSolvedTasks (решенные задачи пользователя в виде битовой карты,
+# заполняется триггером на submissions)
+class UserSolvedTasks(db.Model):
+    __tablename__ = 'usersolvedtasks'
+    user_id = db.Column(db.Integer, primary_key=True)
+    solved_bitmap = db.Column(db.LargeBinary, nullable=False, default=b'')
+    
+    def solved_task_ids(self):
+        # Бит task_id % 8 (от младшего) в байте task_id // 8, как у set_bit в Postgres
+        return [
+            byte_index * 8 + bit
+            for byte_index, byte in enumerate(self.solved_bitmap) if byte
+            for bit in range(8) if byte >> bit & 1
+        ]
+    
 #----------------------------------------------------------------------------------------------------
 
 # таблицы Comments (комментариев)
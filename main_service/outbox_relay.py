@@ -0,0 +1,80 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from config import Config
+from models import db, Task, Submission, SubmissionOutbox
+from rabbitmq_producer import publish_submission_task
+
+# Будит relay сразу после коммита новой попытки, не дожидаясь интервала опроса
+_wakeup = threading.Event()
+
+def wake_outbox_relay():
+    _wakeup.set()
+
+def relay_batch():
+    """Опубликовать пачку попыток из outbox и удалить опубликованные строки.
+
+    Строки выбираются FOR UPDATE SKIP LOCKED, поэтому несколько экземпляров
+    main_service разбирают outbox, не мешая друг другу. Если публикация не
+    удалась, строка откладывается с экспоненциальной задержкой, а остаток
+    пачки ждет следующего прохода. Возвращает (опубликовано, выбрано).
+    """
+    now = datetime.now(timezone.utc)
+    rows = db.session.query(
+        SubmissionOutbox, Submission, Task.time_limit_ms, Task.memory_limit_mb
+    ).join(
+        Submission, Submission.submission_id == SubmissionOutbox.submission_id
+    ).join(
+        Task, Task.task_id == Submission.task_id
+    ).filter(
+        SubmissionOutbox.available_at <= now
+    ).order_by(
+        SubmissionOutbox.outbox_id
+    ).limit(
+        Config.OUTBOX_BATCH_SIZE
+    ).with_for_update(of=SubmissionOutbox, skip_locked=True).all()
+
+    published_ids = []
+    for entry, submission, time_limit_ms, memory_limit_mb in rows:
+        if publish_submission_task(
+            submission_id=submission.submission_id,
+            task_id=submission.task_id,
+            user_id=submission.user_id,
+            code=submission.code,
+            language=submission.language,
+            priority=entry.priority,
+            time_limit_ms=time_limit_ms,
+            memory_limit_mb=memory_limit_mb
+        ):
+            published_ids.append(entry.outbox_id)
+            continue
+        entry.attempts += 1
+        entry.available_at = now + timedelta(seconds=min(2 ** entry.attempts, Config.OUTBOX_MAX_BACKOFF_S))
+        # RabbitMQ недоступен - остальные строки пачки публиковать бесполезно
+        break
+
+    if published_ids:
+        SubmissionOutbox.query.filter(
+            SubmissionOutbox.outbox_id.in_(published_ids)
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    return len(published_ids), len(rows)
+
+def run_outbox_relay(app):
+    while True:
+        published, fetched = 0, 0
+        with app.app_context():
+            try:
+                published, fetched = relay_batch()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Ошибка отправки попыток из outbox: {e}")
+        # Полная пачка ушла целиком - в outbox, скорее всего, есть еще строки
+        if fetched == Config.OUTBOX_BATCH_SIZE and published == fetched:
+            continue
+        _wakeup.wait(Config.OUTBOX_POLL_INTERVAL_S)
+        _wakeup.clear()
+
+def start_outbox_relay(app):
+    thread = threading.Thread(target=run_outbox_relay, args=(app,), name='outbox-relay', daemon=True)
+    thread.start()
+    return thread
@@ -1,50 +1,318 @@
 import pika
 import json
+import zlib
+import base64
+import functools
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from config import Config
 import time
 
-# Функция для публикации сообщения в очередь
-def publish_submission_task(submission_id, task_id, user_id, code, language):
 
-    # Подключаемся к rabbitmq
-    while True:
+class PublisherUnavailable(Exception):
+    """RabbitMQ недоступен или не подтвердил сообщение за отведенное время"""
+
+
+class RabbitPublisher:
+    """Долгоживущий потокобезопасный издатель с подтверждениями публикации.
+
+    Одно соединение (SelectConnection) с каналом в режиме publisher confirms
+    обслуживает отдельный поток: он же отвечает на heartbeat, пока издатель
+    простаивает, и переподключается после обрыва. publish() из потока запроса
+    передает сообщение в этот поток и ждет подтверждения брокера не дольше
+    publish_timeout секунд. Если RabbitMQ не отвечает, издатель retry_interval
+    секунд сразу бросает PublisherUnavailable, чтобы не держать веб-воркеры.
+    """
+
+    def __init__(self, connect_timeout, publish_timeout, retry_interval):
+        self.connect_timeout = connect_timeout
+        self.publish_timeout = publish_timeout
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._ready = threading.Event()
+        # Состояние ниже меняется только в потоке соединения
+        self._opened = False
+        self._connection = None
+        self._channel = None
+        self._declared = set()
+        self._next_tag = 0
+        self._pending = {}
+        self._thread = threading.Thread(target=self._run, name='rabbitmq-publisher', daemon=True)
+        self._thread.start()
+
+    def _mark_down(self):
+        with self._lock:
+            self._down_until = time.monotonic() + self.retry_interval
+
+    def _is_down(self):
+        with self._lock:
+            return time.monotonic() < self._down_until
+
+    def _run(self):
+        while True:
+            self._opened = False
+            self._connection = pika.SelectConnection(
+                pika.ConnectionParameters(
+                    host=Config.RABBITMQ_HOST,
+                    port=Config.RABBITMQ_PORT,
+                    connection_attempts=1,
+                    socket_timeout=self.connect_timeout,
+                    stack_timeout=self.connect_timeout,
+                    blocked_connection_timeout=self.publish_timeout
+                ),
+                on_open_callback=self._on_connection_open,
+                on_open_error_callback=self._on_connection_open_error,
+                on_close_callback=self._on_connection_closed
+            )
+            try:
+                self._connection.ioloop.start()
+            except Exception as e:
+                print(f"Ошибка в потоке издателя RabbitMQ: {e}")
+                self._drop_channel(e)
+            # Оборвалось рабочее соединение - переподключаемся сразу,
+            # не удалось подключиться - ждем retry_interval
+            if not self._opened:
+                self._mark_down()
+                time.sleep(self.retry_interval)
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_open_error(self, connection, error):
+        print(f"Не удалось подключиться к RabbitMQ: {error}")
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        self._drop_channel(reason)
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        self._channel = channel
+        self._declared = set()
+        self._next_tag = 0
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.confirm_delivery(ack_nack_callback=self._on_confirm, callback=self._on_confirm_mode)
+
+    def _on_confirm_mode(self, _frame):
+        self._opened = True
+        with self._lock:
+            self._down_until = 0.0
+        self._ready.set()
+
+    def _on_channel_closed(self, channel, reason):
+        # Канал закрывается брокером, например при ошибке объявления очереди;
+        # переоткрываем вместе с соединением
+        self._drop_channel(reason)
+        if self._connection.is_open:
+            self._connection.close()
+
+    def _drop_channel(self, reason):
+        self._ready.clear()
+        self._channel = None
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(PublisherUnavailable(f'RabbitMQ connection lost: {reason}'))
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = [tag for tag in self._pending if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag]
+        for tag in tags:
+            future = self._pending.pop(tag, None)
+            if future is None or future.done():
+                continue
+            if acked:
+                future.set_result(None)
+            else:
+                future.set_exception(PublisherUnavailable('Message was rejected by the broker'))
+
+    def _publish_on_loop(self, future, exchange, routing_key, body, properties, declare):
+        if not future.set_running_or_notify_cancel():
+            # Запрос уже получил отказ по таймауту
+            return
+        if self._channel is None:
+            future.set_exception(PublisherUnavailable('RabbitMQ channel is not open'))
+            return
+        try:
+            key = (exchange, routing_key)
+            if declare is not None and key not in self._declared:
+                # Команды канала выполняются брокером по порядку: объявление
+                # будет обработано раньше публикации
+                declare(self._channel)
+                self._declared.add(key)
+            self._channel.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=properties
+            )
+        except Exception as e:
+            future.set_exception(PublisherUnavailable(f'RabbitMQ error: {e}'))
+            return
+        self._next_tag += 1
+        self._pending[self._next_tag] = future
+
+    def _abort(self, reason):
+        """Брокер не подтвердил сообщение вовремя: бросаем соединение"""
+        if self._connection is None or self._channel is None:
+            return
+        self._drop_channel(reason)
+        if self._connection.is_open:
+            self._connection.close()
+
+    def publish(self, routing_key, body, properties=None, exchange='', declare=None):
+        """Опубликовать сообщение и дождаться подтверждения брокера.
+
+        declare(channel) объявляет очередь или exchange и вызывается один раз
+        на соединение. Бросает PublisherUnavailable, если RabbitMQ недоступен
+        или не подтвердил сообщение за publish_timeout секунд.
+        """
+        if self._is_down():
+            raise PublisherUnavailable('RabbitMQ is unavailable')
+        if not self._ready.wait(self.connect_timeout):
+            raise PublisherUnavailable('Could not connect to RabbitMQ')
+
+        connection = self._connection
+        future = Future()
+        try:
+            connection.ioloop.add_callback_threadsafe(functools.partial(
+                self._publish_on_loop, future, exchange, routing_key, body, properties, declare
+            ))
+        except Exception as e:
+            raise PublisherUnavailable(f'RabbitMQ error: {e}')
+
         try:
-            # Создаем параметры подключения
-            connection_params = pika.ConnectionParameters(
-                host=Config.RABBITMQ_HOST, 
-                port=Config.RABBITMQ_PORT
+            future.result(timeout=self.publish_timeout)
+        except FutureTimeoutError:
+            # Если сообщение еще не ушло брокеру, оно и не уйдет
+            future.cancel()
+            self._mark_down()
+            try:
+                connection.ioloop.add_callback_threadsafe(functools.partial(
+                    self._abort, 'publish confirmation timed out'
+                ))
+            except Exception:
+                pass
+            raise PublisherUnavailable(
+                f'RabbitMQ did not confirm the message in {self.publish_timeout}s'
             )
-            conn = pika.BlockingConnection(connection_params)
-            ch = conn.channel()
-            print("Успешно подключились к RabbitMQ")
-            break # Успешно подключаемся
-        except pika.exceptions.AMQPConnectionError as e:
-            print(f"Ошибка подключения к RabbitMQ.")
-            time.sleep(5)
-
-    # объявляем очередь
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+def get_publisher():
+    """Общий на процесс издатель"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = RabbitPublisher(
+                connect_timeout=Config.RABBITMQ_CONNECT_TIMEOUT_S,
+                publish_timeout=Config.RABBITMQ_PUBLISH_TIMEOUT_S,
+                retry_interval=Config.RABBITMQ_RETRY_INTERVAL_S
+            )
+    return _publisher
+
+def declare_submission_queue(ch):
     # durable=True - гарантирует, что очередь выживет после перезапуска RabbitMQ
-    ch.queue_declare(queue=Config.RABBITMQ_QUEUE_CODE_RUNNER, durable=True)
+    # x-max-priority - очередь с приоритетами, раннер объявляет ее с теми же аргументами
+    ch.queue_declare(
+        queue=Config.RABBITMQ_QUEUE_CODE_RUNNER,
+        durable=True,
+        arguments={'x-max-priority': Config.RABBITMQ_QUEUE_MAX_PRIORITY}
+    )
 
-    # данные для передачи в rabbit
+def make_submission_message(submission_id, task_id, user_id, code, language,
+                            time_limit_ms=None, memory_limit_mb=None):
+    """Компактное сообщение о попытке.
+
+    Исходник уже лежит в submissions.code, поэтому в сообщение он попадает
+    только сжатым и только если укладывается в INLINE_CODE_MAX_BYTES;
+    иначе раннер сам прочитает его из БД.
+    """
     message = {
         'submission_id': submission_id,
         'task_id': task_id,
         'user_id': user_id,
-        'code': code,
-        'language': language
+        'language': language,
+        'time_limit_ms': time_limit_ms,
+        'memory_limit_mb': memory_limit_mb,
+        # Время постановки в очередь: раннер считает по нему ожидание в очереди
+        'enqueued_at': time.time()
     }
-    
+    compressed = zlib.compress(code.encode('utf-8'))
+    if len(compressed) <= Config.INLINE_CODE_MAX_BYTES:
+        message['code_zlib'] = base64.b64encode(compressed).decode('ascii')
+    return message
+
+# Функция для публикации сообщения в очередь
+def publish_submission_task(submission_id, task_id, user_id, code, language, priority=0,
+                            time_limit_ms=None, memory_limit_mb=None):
+
+    # данные для передачи в rabbit
+    message = make_submission_message(
+        submission_id, task_id, user_id, code, language, time_limit_ms, memory_limit_mb
+    )
+
     #публикация сообщения
-    ch.basic_publish(
-        exchange='', # Пустой exchange означает что сообщение идет напрямую в очередь по имени
-        routing_key=Config.RABBITMQ_QUEUE_CODE_RUNNER,
-        body=json.dumps(message),
-        # delivery_mode = 2 делает сообщение устойчивым: RabbitMQ сохранит его на диск
-        properties=pika.BasicProperties(
-            delivery_mode=pika.spec.DeliveryMode.Persistent 
+    try:
+        get_publisher().publish(
+            routing_key=Config.RABBITMQ_QUEUE_CODE_RUNNER,
+            body=json.dumps(message),
+            # delivery_mode = 2 делает сообщение устойчивым: RabbitMQ сохранит его на диск
+            properties=pika.BasicProperties(
+                delivery_mode=pika.spec.DeliveryMode.Persistent,
+                priority=priority
+            ),
+            declare=declare_submission_queue
         )
-    )
+    except PublisherUnavailable as e:
+        print(f"Ошибка публикации попытки {submission_id}: {e}")
+        return False
+    return True
+
+# Сообщить раннерам, что тесты задачи изменились (их кэш задач сбросит запись)
+def publish_task_update(task_id, test_set_version):
+    try:
+        get_publisher().publish(
+            exchange=Config.RABBITMQ_EXCHANGE_TASK_UPDATES,
+            routing_key='',
+            body=json.dumps({'task_id': task_id, 'test_set_version': test_set_version}),
+            # fanout - каждый раннер получает сообщение в свою очередь
+            declare=lambda ch: ch.exchange_declare(
+                exchange=Config.RABBITMQ_EXCHANGE_TASK_UPDATES, exchange_type='fanout', durable=True
+            )
+        )
+    except PublisherUnavailable:
+        # Раннеры все равно сверят версию с БД при следующей проверке кэша
+        print(f"Не удалось отправить обновление задачи {task_id}: RabbitMQ недоступен")
+        return False
+    return True
 
-    conn.close()
-    return True
\ No newline at end of file
+# Отправить код на запуск на своем вводе или на примерах (без сохранения попытки)
+def publish_run_task(run_id, task_id, user_id, code, language, input_data=None):
+    message = {
+        'run_id': run_id,
+        'task_id': task_id,
+        'user_id': user_id,
+        'code': code,
+        'language': language,
+        'input': input_data
+    }
+    try:
+        get_publisher().publish(
+            routing_key=Config.RABBITMQ_QUEUE_CODE_RUN,
+            body=json.dumps(message),
+            # Запуск не сохраняется на диск и устаревает, если долго ждет в очереди
+            properties=pika.BasicProperties(expiration=str(Config.RUN_MESSAGE_TTL_MS)),
+            declare=lambda ch: ch.queue_declare(queue=Config.RABBITMQ_QUEUE_CODE_RUN, durable=True)
+        )
+    except PublisherUnavailable as e:
+        print(f"Ошибка публикации запуска {run_id}: {e}")
+        return False
+    return True
@@ -1,38 +1,146 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Task, TaskTestCase, Submission, AlgorythmTheory, Theme, Comment, TaskComment, TheoryComment
-from rabbitmq_producer import publish_submission_task
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from models import db, Task, TaskTestCase, Submission, SubmissionOutbox, UserSolvedTasks, AlgorythmTheory, Theme, Comment, TaskComment, TheoryComment
+from rabbitmq_producer import publish_task_update, publish_run_task
+from outbox_relay import wake_outbox_relay
+from catalog_cache import catalog_cached, get_catalog_cache
 from flask import current_app
 import json
-from sqlalchemy import func, case
+import base64
+from sqlalchemy import func, case, tuple_
 import requests
+import uuid
+from functools import wraps
+from datetime import datetime, timedelta, timezone
 
 main_bp = Blueprint('main', __name__)
 
+
+def admin_required(fn):
+    """Доступ только для пользователей с ролью admin (роль берется из JWT)"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if get_jwt().get('role') != 'admin':
+            return jsonify({'msg': 'Недостаточно прав'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+# Порядок сложностей для сортировки (строки сравнивались бы по алфавиту)
+DIFFICULTY_RANK = case(
+    (Task.difficulty_level == 'EASY', 1),
+    (Task.difficulty_level == 'MEDIUM', 2),
+    (Task.difficulty_level == 'HARD', 3),
+    else_=4
+)
+# Сортировка: столбец и тип его значения в cursor
+TASK_LIST_SORTS = {
+    'task_id': (Task.task_id, int),
+    'title': (Task.title, str),
+    'difficulty': (DIFFICULTY_RANK, int)
+}
+TASK_LIST_DEFAULT_LIMIT = 50
+TASK_LIST_MAX_LIMIT = 200
+
+def task_list_query():
+    """Задачи с названием темы одним запросом (только поля для списка)"""
+    return db.session.query(
+        Task.task_id,
+        Task.title,
+        Task.difficulty_level,
+        Task.theme_id,
+        Theme.title.label('theme_title')
+    ).outerjoin(Theme, Theme.theme_id == Task.theme_id)
+
+def task_list_item(row):
+    return {
+        "task_id": row.task_id,
+        "title": row.title,
+        "difficulty_level": row.difficulty_level,
+        "theme_id": row.theme_id,
+        "theme_title": row.theme_title
+    }
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, value_type):
+    """[значение сортировки, task_id] из cursor; ValueError, если он испорчен"""
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError(cursor)
+    # bool - подкласс int, но в cursor его быть не может
+    if any(type(value) is not expected for value, expected in zip(values, (value_type, int))):
+        raise ValueError(cursor)
+    return values
+
 # Получение задач
 @main_bp.route('/tasks/', methods=['GET'])
+@catalog_cached
 def get_tasks_details():
-    tasks = Task.query.all()
+    tasks = task_list_query().order_by(Task.task_id).all()
     if not tasks:
         return jsonify({"msg": "Задачи не найдена"}), 404
     
-    tasks_data = []
-    
-    for task in tasks:
-        task_data = {
-            "task_id": task.task_id,
-            "title": task.title,
-            "difficulty_level": task.difficulty_level,
-            "theme_id": task.theme_id,
-            "theme_title": task.theme.title if task.theme else None
-        }
-        tasks_data.append(task_data)
-    
-    return jsonify(tasks_data), 200
+    return jsonify([task_list_item(task) for task in tasks]), 200
+
+# Список задач по страницам: /tasks/list?theme_id=1&theme_id=2&difficulty=EASY&sort=title&order=desc&limit=50
+# Следующая страница - с параметром cursor из next_cursor предыдущей (keyset-пагинация:
+# вместо OFFSET продолжаем с последней показанной задачи, поэтому страницы не дорожают)
+@main_bp.route('/tasks/list', methods=['GET'])
+@catalog_cached
+def get_tasks_page():
+    sort = request.args.get('sort', 'task_id')
+    order = request.args.get('order', 'asc')
+    limit = request.args.get('limit', TASK_LIST_DEFAULT_LIMIT, type=int)
+    theme_ids = request.args.getlist('theme_id', type=int)
+    difficulties = request.args.getlist('difficulty')
+    cursor = request.args.get('cursor')
+
+    if sort not in TASK_LIST_SORTS:
+        return jsonify({"msg": f"sort должен быть одним из: {', '.join(TASK_LIST_SORTS)}"}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({"msg": "order должен быть asc или desc"}), 400
+    limit = min(max(limit, 1), TASK_LIST_MAX_LIMIT)
+
+    sort_column, sort_type = TASK_LIST_SORTS[sort]
+    # Ключ сортировки дополняется task_id, чтобы порядок был однозначным
+    key = tuple_(sort_column, Task.task_id)
+
+    query = task_list_query()
+    if theme_ids:
+        query = query.filter(Task.theme_id.in_(theme_ids))
+    if difficulties:
+        query = query.filter(Task.difficulty_level.in_(difficulties))
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort_type)
+        except ValueError:
+            return jsonify({"msg": "Некорректный cursor"}), 400
+        after = tuple_(*after)
+        query = query.filter(key > after if order == 'asc' else key < after)
+
+    if order == 'asc':
+        query = query.order_by(sort_column.asc(), Task.task_id.asc())
+    else:
+        query = query.order_by(sort_column.desc(), Task.task_id.desc())
+    # Лишняя строка показывает, есть ли следующая страница
+    rows = query.add_columns(sort_column.label('sort_value')).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].sort_value, rows[-1].task_id])
+
+    return jsonify({
+        "items": [task_list_item(row) for row in rows],
+        "next_cursor": next_cursor
+    }), 200
 
 
 # Получение задачи
 @main_bp.route('/tasks/<int:task_id>', methods=['GET'])
+@catalog_cached
 def get_task_details(task_id):
     task = Task.query.get(task_id)
     if not task:
@@ -56,6 +164,61 @@ def get_task_details(task_id):
     return jsonify(task_data), 200
 
 
+# Запуск кода на своем вводе или на примерах задачи (попытка не сохраняется,
+# результат приходит через notifier событием run_result)
+@main_bp.route('/run_code', methods=['POST'])
+@jwt_required()
+def run_code():
+    data = request.get_json()
+    user_id = get_jwt_identity()
+    task_id = data.get('task_id')
+    code = data.get('code')
+    language = data.get('language', 'python')
+    # input не передан - запускаем на примерах задачи
+    input_data = data.get('input')
+
+    if not task_id:
+        return jsonify({"msg": "Отсутствуют задача"}), 400
+    if not code:
+        return jsonify({"msg": "Отсутствуют выполняемый код"}), 400
+    if input_data is not None and not isinstance(input_data, str):
+        return jsonify({"msg": "Ввод должен быть строкой"}), 400
+    if input_data is not None and len(input_data.encode('utf-8')) > current_app.config['RUN_INPUT_MAX_KB'] * 1024:
+        return jsonify({"msg": "Слишком большой ввод"}), 400
+
+    if not Task.query.get(task_id):
+        return jsonify({"msg": "Задача с таким ID не найдена"}), 404
+
+    run_id = str(uuid.uuid4())
+    if not publish_run_task(run_id, task_id, user_id, code, language, input_data):
+        return jsonify({"msg": "Сервис исполнения кода временно недоступен (RabbitMQ ошибка)"}), 503
+
+    return jsonify({
+        "msg": "Код отправлен на запуск",
+        "run_id": run_id
+    }), 202
+
+def submission_priority(task, user_id):
+    """Приоритет попытки в очереди раннера.
+
+    Быстрые задачи идут раньше долгих, а пользователь, отправляющий попытки
+    пачкой, постепенно уступает место остальным.
+    """
+    if task.time_limit_ms <= 1000:
+        priority = 6
+    elif task.time_limit_ms <= 3000:
+        priority = 4
+    else:
+        priority = 2
+
+    since = datetime.now(timezone.utc) - timedelta(seconds=current_app.config['SUBMISSION_LOAD_WINDOW_S'])
+    recent_submissions = Submission.query.filter(
+        Submission.user_id == user_id,
+        Submission.date > since
+    ).count()
+    priority -= recent_submissions // current_app.config['SUBMISSION_BURST_SIZE']
+    return max(priority, 0)
+
 # Отправка кода на выполнение
 @main_bp.route('/submit_code', methods=['POST'])
 @jwt_required() 
@@ -91,28 +254,22 @@ def submit_code():
         db.session.add(new_submission)
         print("перед flush")
         db.session.flush() 
-        print("Сохранено в бд")
         submission_id = new_submission.submission_id
 
-        #Отправка асинхронной задачи в RabbitM
-        success = publish_submission_task(
+        # В RabbitMQ попытку отправит outbox_relay: строка outbox коммитится
+        # вместе с попыткой, поэтому ни одна из них не потеряется без другой
+        db.session.add(SubmissionOutbox(
             submission_id=submission_id,
-            task_id=task_id,
-            user_id=user_id,
-            code=code,
-            language=language
-        )
-        
-        if success:
-            db.session.commit()
-            return jsonify({
-                "msg": "Код отправлен на проверку. Ожидайте результата.",
-                "submission_id": submission_id,
-                "user_id": user_id 
-            }), 202 
-        else:
-            db.session.rollback()
-            return jsonify({"msg": "Сервис исполнения кода временно недоступен (RabbitMQ ошибка)"}), 503
+            priority=submission_priority(task, user_id)
+        ))
+        db.session.commit()
+        print("Сохранено в бд")
+        wake_outbox_relay()
+        return jsonify({
+            "msg": "Код отправлен на проверку. Ожидайте результата.",
+            "submission_id": submission_id,
+            "user_id": user_id 
+        }), 202 
             
     except Exception as e:
         db.session.rollback()
@@ -121,6 +278,7 @@ def submit_code():
 
 # Получить теорию по теме
 @main_bp.route('/theory/<int:theme_id>', methods=['GET'])
+@catalog_cached
 def get_theory(theme_id):
     theory = AlgorythmTheory.query.filter_by(theme_id=theme_id).first()
     if not theory:
@@ -151,16 +309,94 @@ def mark_solved():
         db.session.rollback()
         return jsonify({'msg': 'Ошибка сервера', 'error': str(e)}), 500
 
+def notify_task_updated(task_id):
+    """Разослать раннерам новую версию набора тестов задачи (версию повышает триггер в БД)"""
+    test_set_version = db.session.query(Task.test_set_version).filter_by(task_id=task_id).scalar()
+    publish_task_update(task_id, test_set_version)
+    # Примеры тестов отдаются в /tasks/<id>: ревизию каталога уже повысил триггер
+    get_catalog_cache().invalidate()
+
+# Добавить тест к задаче
+@main_bp.route('/tasks/<int:task_id>/test_cases', methods=['POST'])
+@admin_required
+def add_test_case(task_id):
+    task = Task.query.get(task_id)
+    if not task:
+        return jsonify({'msg': 'Задача не найдена'}), 404
+
+    data = request.get_json()
+    input_data = data.get('input_data')
+    expected_output = data.get('expected_output')
+    if input_data is None or expected_output is None:
+        return jsonify({'msg': 'input_data и expected_output обязательны'}), 400
+
+    try:
+        test_case = TaskTestCase(task_id=task_id, input_data=input_data,
+                                 expected_output=expected_output,
+                                 is_example=bool(data.get('is_example', False)))
+        db.session.add(test_case)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': 'Ошибка сервера', 'error': str(e)}), 500
+
+    notify_task_updated(task_id)
+    return jsonify({'msg': 'Тест добавлен', 'test_case_id': test_case.test_case_id}), 201
+
+# Изменить тест
+@main_bp.route('/test_cases/<int:test_case_id>', methods=['PUT'])
+@admin_required
+def update_test_case(test_case_id):
+    test_case = TaskTestCase.query.get(test_case_id)
+    if not test_case:
+        return jsonify({'msg': 'Тест не найден'}), 404
+
+    data = request.get_json()
+    try:
+        if 'input_data' in data:
+            test_case.input_data = data['input_data']
+        if 'expected_output' in data:
+            test_case.expected_output = data['expected_output']
+        if 'is_example' in data:
+            test_case.is_example = bool(data['is_example'])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': 'Ошибка сервера', 'error': str(e)}), 500
+
+    notify_task_updated(test_case.task_id)
+    return jsonify({'msg': 'Тест обновлен'}), 200
+
+# Удалить тест
+@main_bp.route('/test_cases/<int:test_case_id>', methods=['DELETE'])
+@admin_required
+def delete_test_case(test_case_id):
+    test_case = TaskTestCase.query.get(test_case_id)
+    if not test_case:
+        return jsonify({'msg': 'Тест не найден'}), 404
+
+    task_id = test_case.task_id
+    try:
+        db.session.delete(test_case)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': 'Ошибка сервера', 'error': str(e)}), 500
+
+    notify_task_updated(task_id)
+    return jsonify({'msg': 'Тест удален'}), 200
+
 # Получить список решённых задач пользователя
 @main_bp.route('/user_solved/<int:user_id>', methods=['GET'])
 def user_solved(user_id):
-    solved = Submission.query.filter_by(user_id=user_id, is_complete=True).all()
-    solved_ids = [s.task_id for s in solved]
-    return jsonify({'solved_task_ids': solved_ids}), 200
+    # Битовой карты нет - пользователь еще ничего не решил
+    solved = UserSolvedTasks.query.get(user_id)
+    return jsonify({'solved_task_ids': solved.solved_task_ids() if solved else []}), 200
 
 
 # Получение всех тем
 @main_bp.route('/themes/', methods=['GET'])
+@catalog_cached
 def get_themes():
     themes = Theme.query.all()
     themes_data = [{
@@ -172,6 +408,7 @@ def get_themes():
 
 # Получение задач с фильтрацией
 @main_bp.route('/tasks/filter', methods=['GET'])
+@catalog_cached
 def get_filtered_tasks():
     theme_id = request.args.get('theme_id', type=int)
     difficulty = request.args.get('difficulty')
@@ -13,6 +13,10 @@ class Config:
     # Очередь, которую мы СЛУШАЕМ (результаты от Runner)
     RABBITMQ_QUEUE_RESULTS = 'code_results_queue'
     
+    # События о ходе проверки рассылаются клиентам пачками раз в этот интервал,
+    # из нескольких событий одной попытки уходит только последнее
+    PROGRESS_EMIT_INTERVAL_MS = int(os.environ.get('PROGRESS_EMIT_INTERVAL_MS', 300))
+    
     # Настройки SocketIO:
     # 1. Message Queue URL: SocketIO должен использовать тот же брокер (RabbitMQ) 
     #    для рассылки сообщений между рабочими процессами (workers).
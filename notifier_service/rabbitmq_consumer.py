@@ -10,6 +10,11 @@ logger = logging.getLogger(__name__)
 
 socketio = None 
 
+# Последнее еще не отправленное событие о ходе проверки для каждой попытки:
+# события, пришедшие между рассылками, схлопываются в одно
+_pending_progress = {}
+_progress_lock = threading.Lock()
+
 def start_rabbitmq_consumer(app_socketio):
     global socketio
     socketio = app_socketio
@@ -17,6 +22,9 @@ def start_rabbitmq_consumer(app_socketio):
     thread = threading.Thread(target=run_consumer_loop)
     thread.daemon = True
     thread.start()
+    
+    progress_thread = threading.Thread(target=run_progress_flusher, daemon=True)
+    progress_thread.start()
     logger.info("✅ RabbitMQ consumer started in background thread")
 
 def run_consumer_loop():
@@ -54,25 +62,68 @@ def run_consumer_loop():
             logger.info("Retrying in 5 seconds...")
             time.sleep(5)
 
+def run_progress_flusher():
+    """Раз в PROGRESS_EMIT_INTERVAL_MS рассылает накопившиеся события о ходе проверки"""
+    while True:
+        time.sleep(Config.PROGRESS_EMIT_INTERVAL_MS / 1000)
+        try:
+            flush_progress()
+        except Exception as e:
+            logger.error(f"Error sending progress events: {e}")
+
+def flush_progress():
+    with _progress_lock:
+        if not socketio:
+            return
+        events = list(_pending_progress.values())
+        _pending_progress.clear()
+        # Отправка под блокировкой: итоговый результат не может обогнать событие о ходе проверки
+        for event in events:
+            socketio.emit(
+                'submission_progress',
+                event,
+                room=f"user_{event['user_id']}",
+                namespace='/'
+            )
+
 def process_result_message(ch, method, properties, body):
     """Обрабатывает сообщение с результатом и отправляет его через SocketIO."""
     try:
         result_data = json.loads(body)
         user_id = result_data.get('user_id')
-        submission_id = result_data.get('submission_id')
         
-        logger.info(f"Received result for submission {submission_id}, user {user_id}")
+        if result_data.get('type') == 'submission_progress':
+            # Ход проверки не рассылаем сразу, а копим до следующей рассылки
+            if user_id:
+                with _progress_lock:
+                    _pending_progress[result_data.get('submission_id')] = result_data
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        
+        # Результаты запусков на своем вводе идут отдельным событием
+        if result_data.get('type') == 'run_result':
+            event = 'run_result'
+            result_id = f"run {result_data.get('run_id')}"
+        else:
+            event = 'submission_result'
+            result_id = f"submission {result_data.get('submission_id')}"
+        
+        logger.info(f"Received result for {result_id}, user {user_id}")
         
         if user_id and socketio:
-            # Отправка результата по WebSocket
-            socketio.emit(
-                'submission_result', 
-                result_data, 
-                room=f'user_{user_id}',
-                namespace='/'
-            )
+            # Отправка результата по WebSocket. Неотправленный ход проверки
+            # этой попытки уже не нужен
+            with _progress_lock:
+                if event == 'submission_result':
+                    _pending_progress.pop(result_data.get('submission_id'), None)
+                socketio.emit(
+                    event, 
+                    result_data, 
+                    room=f'user_{user_id}',
+                    namespace='/'
+                )
             
-            logger.info(f"✅ Sent result for Submission ID {submission_id} to user {user_id}")
+            logger.info(f"✅ Sent result for {result_id} to user {user_id}")
         else:
             logger.error(f"❌ Error: Could not send result. user_id: {user_id}, socketio: {socketio}")
             